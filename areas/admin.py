@@ -1,16 +1,39 @@
 from django import forms
-from django.contrib.admin import widgets
+from django.conf.urls import url
+from django.contrib.admin import helpers, widgets
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import SEARCH_VAR, ChangeList
 from django.contrib import admin
 from django.contrib.gis import admin as geo_admin
-from django.db import models
+from django.contrib.gis.geos import Polygon
+from django.contrib.postgres.search import TrigramSimilarity
+from django.core.exceptions import PermissionDenied
+from django.db import models, transaction
 from django.db.models import Q
-from django.utils.html import mark_safe
+from django.forms.models import BaseInlineFormSet
+from django.conf import settings
+from django.http import Http404, HttpResponseBadRequest
+from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.utils.html import format_html_join, mark_safe
+from django.views.decorators.http import condition
+import copy
 import json
+import operator
+import re
 import urllib
 
 from localflavor.us.models import PhoneNumberField
 
-from .models import Area, PrecinctCoordinator, WaPrecinct
+from .clusters import CLUSTER_MAX_ZOOM, cluster_coordinators, shape_tolerance
+from .dashboard import dashboard_data
+from .dedup import DuplicateFinder, merge_clusters, pick_survivor
+from .exports import EXPORT_FORMATS, export_response
+from .geojson import coordinator_topology, iter_coordinator_features, iter_feature_collection
+from .mailmerge import MailMerge
+from .models import Affiliation, Area, AreaMap, AreaPrecinct, PrecinctCoordinator, WaPrecinct
+from .payloads import cached_payload, payload_etag
+from .phones import unparsed_phone_text
 from .widgets import ForeignKeyRawIdHiddenWidget
 
 
@@ -23,6 +46,38 @@ class WaPrecinctAdmin(geo_admin.OSMGeoAdmin):
         return super(WaPrecinctAdmin, self).get_queryset(request).defer('map_cache_geometry') 
 
 
+@admin.register(AreaPrecinct)
+class AreaPrecinctAdmin(admin.ModelAdmin):
+    list_display = ['precinct', 'area']
+    list_filter = ['area']
+    search_fields = ['precinct__long_name']
+    raw_id_fields = ['precinct']
+
+    def get_queryset(self, request):
+        return super(AreaPrecinctAdmin, self).get_queryset(request).select_related('area', 'precinct') \
+                                                                     .defer('precinct__map_cache_geometry')
+
+
+PHONE_FRAGMENT_RE = re.compile(r'^[\d\s().+-]*\d[\d\s().+-]*$')
+
+
+def search_terms(search_term):
+    """
+    Splits a changelist search into lowercased terms, each as a list of the forms
+    it may take in a search_document: a phone number fragment also matches its
+    bare digits, which is how the document stores phone numbers, while "46-2301"
+    still matches as typed in a precinct name.
+    """
+    terms = []
+    for term in search_term.lower().split():
+        forms = [term]
+        digits = re.sub(r'\D', '', term)
+        if PHONE_FRAGMENT_RE.match(term) and digits != term:
+            forms.append(digits)
+        terms.append(forms)
+    return terms
+
+
 class PrecinctStatusListFilter(admin.SimpleListFilter):
     title = "Precinct Status"
     parameter_name = 'precinct_status'
@@ -38,28 +93,32 @@ class PrecinctStatusListFilter(admin.SimpleListFilter):
 
     def queryset(self, request, queryset):
         lookup_to_status = {
-            'needs-walker': Q(Q(status='will-walk') | Q(status='picked-up-packet') | Q(status='walked') | Q(status='data-entered')),
             'needs-packets': {'status': 'will-walk'},
             'needs-walk': {'status': 'picked-up-packet'},
             'needs-enter-data': {'status': 'walked'},
             'done': {'status': 'data-entered'}
         }
 
-        if self.value():
+        if self.value() == 'needs-walker':
+            # read from the per-precinct rollup rather than aggregating coordinators here
+            return queryset.exclude(precinct__status_rollup__has_walker=True).exclude(status='will-not-walk')
+        elif self.value() in lookup_to_status:
+            return queryset.filter(**lookup_to_status[self.value()])
+
+        return queryset
+
 
-            if isinstance(lookup_to_status[self.value()], dict):
-                matching = queryset.filter(**lookup_to_status[self.value()])
-            elif isinstance(lookup_to_status[self.value()], list):
-                matching = queryset.filter(*lookup_to_status[self.value()])
-            else:
-                matching = queryset.filter(lookup_to_status[self.value()])
-            
-            if self.value() == 'needs-walker':
-                precinct_ids_to_exclude = matching.values_list('precinct_id', flat=True)
-                return queryset.exclude(precinct_id__in=precinct_ids_to_exclude).exclude(status='will-not-walk')
-            else:
-                return matching
+class AffiliationListFilter(admin.SimpleListFilter):
+    title = "Affiliations"
+    parameter_name = 'affiliation'
 
+    def lookups(self, request, model_admin):
+        return [(slug, label) for mask, slug, label in Affiliation.table()]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            mask = Affiliation.mask_for([self.value()])
+            return queryset.with_affiliations(mask) if mask else queryset.none()
         return queryset
 
 
@@ -76,23 +135,182 @@ class HideMapListFilter(admin.SimpleListFilter):
         return queryset
 
 
+class FilteredChangeList(ChangeList):
+    """
+    A ChangeList that only applies the admin's filters, search and ordering;
+    it skips the counting and pagination the HTML changelist needs.
+    """
+
+    def get_results(self, request):
+        self.result_count = self.full_result_count = None
+        self.result_list = []
+
+
 @admin.register(PrecinctCoordinator)
 class PrecinctCoordinatorAdmin(admin.ModelAdmin):
-    list_display = ['full_name', 'location', 'phone_number_linebreaks', 'linkable_email', 'status', 'affiliations_list']
-    list_filter = ['area', PrecinctStatusListFilter, 'status', 'affiliations', HideMapListFilter]
+    # get_list_display turns email into a mailto link for whoever is looking
+    list_display = ['full_name', 'location', 'phone_number_linebreaks', 'email', 'status', 'affiliations_list']
+    list_filter = ['area', PrecinctStatusListFilter, 'status', AffiliationListFilter, HideMapListFilter]
     raw_id_fields = ['precinct']
+    readonly_fields = ['shares_phone_with']
+    actions = ['merge_duplicates', 'export_csv', 'export_xlsx']
+    # what search_document covers; get_search_results does the searching
     search_fields = ['full_name', 'email', 'phone_number', 'precinct__long_name']
     change_list_template = 'admin/areas/area/precinct-coordinator-changelist.html'
     list_select_related = ['area', 'precinct']
 
     def affiliations_list(self, obj):
-        return mark_safe("<br />".join(aff.label for aff in obj.affiliations.all()))
+        return mark_safe("<br />".join(Affiliation.labels_for(obj.affiliation_mask)))
     affiliations_list.short_description = "Affiliations"
-    affiliations_list.admin_order_field = "affiliations__label"
+    affiliations_list.admin_order_field = "affiliation_mask"
 
     def get_queryset(self, request, *args, **kwargs):
-        self.request = request
-        return super(PrecinctCoordinatorAdmin, self).get_queryset(request, *args, **kwargs).prefetch_related('affiliations')
+        # the table only needs the precinct's names; polygons reach the map through
+        # the geojson view and the PrecinctShape cache instead of the (huge)
+        # wa_precincts geometry column.
+        return super(PrecinctCoordinatorAdmin, self).get_queryset(request, *args, **kwargs) \
+            .defer('precinct__map_cache_geometry') \
+            .prefetch_related('phone_numbers')
+
+    def get_list_display(self, request):
+        # mailto links are signed by whoever is looking, so the column is bound to
+        # this request rather than kept on the ModelAdmin every thread shares
+        mail_merge = MailMerge(request.user.first_name)
+
+        def linkable_email(obj):
+            return mail_merge.mailto(obj)
+        linkable_email.short_description = "Email"
+        linkable_email.admin_order_field = "email"
+
+        list_display = super(PrecinctCoordinatorAdmin, self).get_list_display(request)
+        return [linkable_email if name == 'email' else name for name in list_display]
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Matches every term against search_document, which the trigram index can
+        answer, rather than search_fields' icontains scans across the precinct
+        join; get_ordering puts the most similar first.
+        """
+        terms = search_terms(search_term)
+        if not terms:
+            return queryset, False
+        for alternatives in terms:
+            queryset = queryset.filter(reduce(operator.or_, [Q(search_document__contains=form) for form in alternatives]))
+        return queryset.annotate(search_rank=TrigramSimilarity('search_document', ' '.join(alternatives[0] for alternatives in terms))), False
+
+    def get_ordering(self, request):
+        ordering = super(PrecinctCoordinatorAdmin, self).get_ordering(request)
+        if search_terms(request.GET.get(SEARCH_VAR, '')):
+            return ['-search_rank'] + list(ordering or self.model._meta.ordering)
+        return ordering
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = dict(extra_context or {}, map_payload_format=settings.MAP_PAYLOAD_FORMAT)
+        return super(PrecinctCoordinatorAdmin, self).changelist_view(request, extra_context)
+
+    def save_model(self, request, obj, form, change):
+        obj._changed_by = request.user
+        super(PrecinctCoordinatorAdmin, self).save_model(request, obj, form, change)
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            url(r'^geojson/$', self.admin_site.admin_view(condition(etag_func=payload_etag)(self.geojson_view)), name='%s_%s_geojson' % info),
+            url(r'^map-data/$', self.admin_site.admin_view(condition(etag_func=payload_etag)(self.map_data_view)), name='%s_%s_map_data' % info),
+            url(r'^export/$', self.admin_site.admin_view(self.export_view), name='%s_%s_export' % info),
+        ] + super(PrecinctCoordinatorAdmin, self).get_urls()
+
+    def get_filtered_queryset(self, request, ignore_params=()):
+        """
+        The whole (unpaginated) queryset the changelist would show for request's
+        filters and search. ignore_params are our own querystring arguments,
+        which the ChangeList would otherwise treat as field lookups.
+        """
+        if ignore_params:
+            # a shallow copy, so the view can still read its own arguments from request
+            request = copy.copy(request)
+            request.GET = request.GET.copy()
+            for param in ignore_params:
+                request.GET.pop(param, None)
+
+        list_display = self.get_list_display(request)
+        cl = FilteredChangeList(
+            request, self.model, list_display,
+            self.get_list_display_links(request, list_display), self.get_list_filter(request),
+            self.date_hierarchy, self.get_search_fields(request), self.get_list_select_related(request),
+            self.list_per_page, self.list_max_show_all, self.list_editable, self,
+        )
+        # built once, in ChangeList.__init__
+        return cl.queryset
+
+    def geojson_view(self, request):
+        if not self.has_change_permission(request, None):
+            raise PermissionDenied
+
+        key = payload_etag(request)
+        output_format = request.GET.get('format', 'geojson')
+
+        def render():
+            queryset = self.get_filtered_queryset(request, ignore_params=('format',))
+            if output_format == 'topojson':
+                # arcs are shared across the whole result, so this one can't stream
+                return json.dumps(coordinator_topology(queryset))
+            return iter_feature_collection(iter_coordinator_features(queryset))
+
+        try:
+            return cached_payload(key, render)
+        except IncorrectLookupParameters:
+            return HttpResponseBadRequest('Invalid filters.')
+
+    def map_data_view(self, request):
+        """
+        What the changelist map needs for one viewport: ?bbox=west,south,east,north&zoom=z
+        plus the changelist's filters. Low zooms get status-counted clusters, high zooms
+        the precinct shapes, and either way only precincts overlapping the viewport.
+        """
+        if not self.has_change_permission(request, None):
+            raise PermissionDenied
+
+        try:
+            bbox = Polygon.from_bbox([float(value) for value in request.GET['bbox'].split(',')])
+            bbox.srid = 4326
+            zoom = int(request.GET['zoom'])
+        except (KeyError, ValueError):
+            return HttpResponseBadRequest('Expected ?bbox=west,south,east,north&zoom=z')
+
+        key = payload_etag(request)
+        output_format = request.GET.get('format', 'geojson')
+
+        def render():
+            # && against wa_precincts' GiST index, without reading any geometry back
+            queryset = self.get_filtered_queryset(request, ignore_params=('bbox', 'zoom', 'format')).filter(precinct__map_cache_geometry__bboverlaps=bbox)
+            if zoom <= CLUSTER_MAX_ZOOM:
+                return json.dumps({'type': 'Clusters', 'clusters': cluster_coordinators(queryset, zoom)})
+            if output_format == 'topojson':
+                return json.dumps(coordinator_topology(queryset, shape_tolerance(zoom)))
+            return iter_feature_collection(iter_coordinator_features(queryset, shape_tolerance(zoom)))
+
+        try:
+            return cached_payload(key, render)
+        except IncorrectLookupParameters:
+            return HttpResponseBadRequest('Invalid filters.')
+
+    def export_view(self, request):
+        """
+        Downloads everything the changelist would show for the same filters and
+        search, as ?format=csv or ?format=xlsx.
+        """
+        if not self.has_change_permission(request, None):
+            raise PermissionDenied
+
+        output_format = request.GET.get('format', 'csv')
+        if output_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest('Expected ?format=%s' % ' or ?format='.join(EXPORT_FORMATS))
+        try:
+            queryset = self.get_filtered_queryset(request, ignore_params=('format',))
+        except IncorrectLookupParameters:
+            return HttpResponseBadRequest('Invalid filters.')
+        return export_response(queryset, output_format)
 
     def location(self, obj):
         return mark_safe("<br />".join([obj.precinct.long_name, obj.area.name]))
@@ -105,88 +323,141 @@ class PrecinctCoordinatorAdmin(admin.ModelAdmin):
     # get_precinct.admin_order_field = 'precinct__short_name'
 
     def phone_number_linebreaks(self, obj):
-        return mark_safe("<br />".join(obj.phone_number.split('\n')))
+        numbers = [unicode(phone) for phone in obj.phone_numbers.all()]
+        # anything we couldn't parse a number out of is shown as entered
+        numbers = numbers + unparsed_phone_text(obj.phone_number) if numbers else (obj.phone_number or '').split('\n')
+        return mark_safe("<br />".join(numbers))
     phone_number_linebreaks.short_description = "Phone Number"
     phone_number_linebreaks.admin_order_field = "phone_number"
 
-    def linkable_email(self, obj):
-        if not obj.email:
-            return ''
-        extra = {}
-        first_name = obj.full_name.split(' ')[0]
-        precinct_name = obj.precinct.long_name
-        author_name = self.request.user.first_name
-
-        if len(filter(lambda a: a.slug in ['elected', 'appointed', 'acting', 'elected-post-reorg'], obj.affiliations.all())):
-            descriptor = 'PCOs'
-        elif len(filter(lambda a: a.slug == 'delegate', obj.affiliations.all())):
-            descriptor = 'precinct delegates who caucused with us in March,'
-        else:
-            descriptor = 'volunteers'
-
-        subject_verb = "planning on" if len(filter(lambda a: a.slug == 'elected', obj.affiliations.all())) else 'interested in'
-
-        if not obj.status:
-            extra = {
-                'subject': "[46 Dems] %(first_name)s, are you %(verb)s walking your precinct?" % {'first_name': first_name, 'verb': subject_verb},
-                'body': """Hi %(first_name)s,
-
-My name is %(author_name)s, I'm a volunteer with the 46th District Democrats.
-
-Election Day is just around the corner, and we are excited to be ramping up our Get Out the Vote efforts in the 46th. We are reaching out to %(descriptor)s and wondered if you'd be interested in walking your precinct, %(precinct_name)s? It would be a huge help toward turning out Democratic voters in your neighborhood, and with your help, we will win big on Election Day.
-
-We have got a packet with a walk list and literature all ready to go. We can also set you up with a mobile phone app called MiniVAN, which makes walking your precinct a breeze.
-
-Let me know if you're interested, and we'll get you all setup. We'd love to have your help in making this election a big success for Democrats.
-
-Thanks, %(first_name)s!
-
-%(author_name)s""" % {'first_name': first_name, 'author_name': author_name, 'precinct_name': precinct_name, 'descriptor': descriptor}
-            }
-
-        elif obj.status == 'will-walk':
-
-
-            ## TODO: add more location specific logic.
-            extra = {
-                'subject': "%(first_name)s, your walk packet for %(precinct_name)s is ready for pickup" % {'first_name': first_name, 'precinct_name': precinct_name},
-                'body': """Hi %(first_name)s,
-
-Just a friendly heads up -- your precinct walk packet is available for pickup.
-
-
-
-Please make a plan to scoop it up and walk your precinct (and let me know if you have any questions!)
-
-Thanks!
-
-%(author_name)s""" % {'first_name': first_name, 'author_name': author_name}
-            }
-
-
-        elif obj.status == 'picked-up-packet':
-            extra = {
-                'subject': "How's it going?",
-                'body': """Hey %(first_name)s,
-
-Just checking in -- have you been able to walk your precinct?
+    def merge_duplicates(self, request, queryset):
+        """
+        Lists the proposed merges for confirmation, like delete_selected does, and
+        merges exactly the confirmed clusters once that page is posted back.
+        """
+        if request.POST.get('post'):
+            selected = set(queryset.values_list('pk', flat=True))
+            clusters = [[int(pk) for pk in value.split(',')] for value in request.POST.getlist('cluster')]
+            clusters = [cluster for cluster in clusters if len(cluster) > 1 and set(cluster) <= selected]
+            merged = merge_clusters(clusters)
+            self.message_user(request, 'Merged %s duplicates into %s coordinators.' % (merged, len(clusters)))
+            return None
+
+        finder = DuplicateFinder(queryset)
+        clusters = finder.clusters()
+        if not clusters:
+            self.message_user(request, 'No duplicates found among the selected coordinators.')
+            return None
+
+        coordinators = self.model.objects.select_related('precinct').defer('precinct__map_cache_geometry') \
+                                         .in_bulk([pk for cluster in clusters for pk in cluster])
+        proposals = []
+        for cluster in clusters:
+            members = [coordinators[pk] for pk in cluster]
+            survivor = pick_survivor(members)
+            proposals.append({
+                'ids': ','.join(str(pk) for pk in cluster),
+                'score': finder.cluster_score(cluster),
+                'survivor': survivor,
+                'others': [c for c in members if c.pk != survivor.pk],
+            })
 
-Thanks!
+        context = dict(
+            self.admin_site.each_context(request),
+            title='Merge duplicate coordinators',
+            opts=self.model._meta,
+            proposals=proposals,
+            selected_ids=queryset.values_list('pk', flat=True),
+            action_checkbox_name=helpers.ACTION_CHECKBOX_NAME,
+        )
+        return TemplateResponse(request, 'admin/areas/area/merge-duplicates.html', context)
+    merge_duplicates.short_description = "Merge duplicates among selected coordinators"
 
-%(author_name)s""" % {'first_name': first_name, 'author_name': author_name}
-            }
+    def export_csv(self, request, queryset):
+        return export_response(queryset, 'csv')
+    export_csv.short_description = "Export selected coordinators as CSV"
 
-        # URL encode the values, but not the keys.
-        for k, v in extra.iteritems():
-            extra[k] = "%0D%0A".join(v.split('\n'))
+    def export_xlsx(self, request, queryset):
+        return export_response(queryset, 'xlsx')
+    export_xlsx.short_description = "Export selected coordinators as XLSX"
 
-        return mark_safe("<a href=\"mailto:%(email)s%(extra)s\" target=\"_blank\">%(email)s</a>" % {'email': obj.email, 'extra': '?' +  "&".join(["=".join([k,v]) for k,v in extra.iteritems()]) if extra else ''})
-    linkable_email.short_description = "Email"
-    linkable_email.admin_order_field = "email"
+    def shares_phone_with(self, obj):
+        if not obj.pk:
+            return ''
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return format_html_join(mark_safe('<br />'), '<a href="{}">{}</a> ({})', (
+            (reverse('admin:%s_%s_change' % info, args=(other.pk,)), other.full_name, other.precinct.long_name)
+            for other in obj.shares_phone_with().select_related('precinct').defer('precinct__map_cache_geometry')
+        )) or 'Nobody else'
+    shares_phone_with.short_description = "Others With This Number"
+
+
+
+class PrecinctCoordinatorInlineFormSet(BaseInlineFormSet):
+    """
+    Looks up every row's precinct in one query and hands them to the rows'
+    ForeignKeyRawIdHiddenWidgets to label with.
+    """
+
+    def precincts(self):
+        if not hasattr(self, '_precincts'):
+            precinct_ids = set(coordinator.precinct_id for coordinator in self.get_queryset())
+            if self.is_bound:
+                for i in range(self.total_form_count()):
+                    try:
+                        precinct_ids.add(int(self.data.get(self.add_prefix(i) + '-precinct')))
+                    except (TypeError, ValueError):
+                        pass
+            self._precincts = WaPrecinct.objects.defer('map_cache_geometry').in_bulk(precinct_ids - set([None]))
+        return self._precincts
+
+    def _construct_form(self, i, **kwargs):
+        form = super(PrecinctCoordinatorInlineFormSet, self)._construct_form(i, **kwargs)
+        widget = form.fields['precinct'].widget
+        if isinstance(widget, ForeignKeyRawIdHiddenWidget):
+            widget.related_objects = self.precincts()
+        return form
+
+    def save_existing_objects(self, commit=True):
+        """
+        Writes the changed rows through PrecinctCoordinator.save_changed() in
+        batches, rather than a save() per row.
+        """
+        if not commit:
+            return super(PrecinctCoordinatorInlineFormSet, self).save_existing_objects(commit)
+
+        self.changed_objects = []
+        self.deleted_objects = []
+        changed_forms = []
+        forms_to_delete = self.deleted_forms
+        for form in self.initial_forms:
+            obj = form.instance
+            if form in forms_to_delete:
+                if obj.pk is None:
+                    continue
+                self.deleted_objects.append(obj)
+                self.delete_existing(obj, commit=commit)
+            elif form.has_changed():
+                self.changed_objects.append((obj, form.changed_data))
+                changed_forms.append(form)
+
+        opts = self.model._meta
+        concrete = dict((f.name, f.attname) for f in opts.concrete_fields)
+        with transaction.atomic():
+            PrecinctCoordinator.save_changed([
+                (form.instance, [concrete[name] for name in form.changed_data if name in concrete])
+                for form in changed_forms
+            ])
+            for form in changed_forms:
+                for field in opts.many_to_many:
+                    if field.name in form.changed_data:
+                        field.save_form_data(form.instance, form.cleaned_data[field.name])
+        return [form.instance for form in changed_forms]
 
 
 class PrecinctCoordinatorInline(admin.TabularInline):
     model = PrecinctCoordinator
+    formset = PrecinctCoordinatorInlineFormSet
     raw_id_fields = ['precinct']
     read_only_fields = ['precinct']
     formfield_overrides = {
@@ -214,6 +485,15 @@ class PrecinctCoordinatorInline(admin.TabularInline):
 
         return db_field.formfield(**kwargs)
 
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        formfield = super(PrecinctCoordinatorInline, self).formfield_for_manytomany(db_field, request, **kwargs)
+        if formfield is not None:
+            # read the choices once for the formset rather than once per row
+            formfield.choices = list(formfield.choices)
+        return formfield
+
+    def get_queryset(self, request):
+        return super(PrecinctCoordinatorInline, self).get_queryset(request).prefetch_related('affiliations')
 
 
 @admin.register(Area)
@@ -224,28 +504,47 @@ class AreaAdmin(admin.ModelAdmin):
     exclude = []
 
 
-    def geojsonify(self, obj):
-        return json.dumps({'type': 'Feature', 'properties': {}, 'geometry': json.loads(obj.transform(4326, clone=True).simplify(0.0001).json)})
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            url(r'^dashboard/$', self.admin_site.admin_view(self.dashboard_view), name='%s_%s_dashboard' % info),
+            url(r'^(\d+)/map/$', self.admin_site.admin_view(condition(etag_func=payload_etag)(self.map_view)), name='%s_%s_map' % info),
+        ] + super(AreaAdmin, self).get_urls()
+
+    def dashboard_view(self, request):
+        if not self.has_change_permission(request, None):
+            raise PermissionDenied
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=self.model._meta,
+            title='GOTV Progress',
+            dashboard=dashboard_data(),
+        )
+        return TemplateResponse(request, 'admin/areas/area/dashboard.html', context)
 
+    def save_formset(self, request, form, formset, change):
+        for inline_form in formset.forms:
+            inline_form.instance._changed_by = request.user
+        super(AreaAdmin, self).save_formset(request, form, formset, change)
 
-    def change_view(self, request, object_id, form_url='', extra_context=None):
-        extra_context = extra_context or {}
-        obj = self.get_object(request, object_id)
+    def map_view(self, request, object_id):
+        """
+        The change form's map, fetched separately so reloads of an unchanged area
+        come back as a 304 without touching the database.
+        """
+        if not self.has_change_permission(request, None):
+            raise PermissionDenied
 
-        if obj:            
-            precincts = []
-            for pco in obj.precinctcoordinator_set.all():
-                precincts.append({
-                    'pco': pco,
-                    'polygon': self.geojsonify(pco.precinct.map_cache_geometry),
-                    'centroid': pco.precinct.map_cache_geometry.centroid.transform(4326, clone=True),
-                })
-            extra_context['precincts'] = precincts
+        def render():
+            # only checked when the payload isn't cached; payload_for would build (and save) a map for any id
+            if not Area.objects.filter(pk=object_id).exists():
+                raise Http404('No area with id %s.' % object_id)
+            return AreaMap.payload_for(int(object_id), settings.MAP_PAYLOAD_FORMAT)
 
-        return self.changeform_view(request, object_id, form_url, extra_context)
+        return cached_payload(payload_etag(request), render)
 
     class Media:
         css = {
             "all": ("https://npmcdn.com/leaflet@0.7.7/dist/leaflet.css",)
         }
-        js = ("https://npmcdn.com/leaflet@0.7.7/dist/leaflet.js",)
\ No newline at end of file
+        js = ("https://npmcdn.com/leaflet@0.7.7/dist/leaflet.js", "https://unpkg.com/topojson-client@2")
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""
+Grid clustering of coordinators for the low zoom levels of the changelist map.
+"""
+from collections import Counter
+import math
+
+from .cursors import iter_cursor_chunks
+from .models import PrecinctShape
+
+
+# below this zoom the map gets clusters rather than precinct shapes
+CLUSTER_MAX_ZOOM = 13
+
+# grid cells per 256px map tile, i.e. a cluster covers about 64px of screen
+CELLS_PER_TILE = 4
+
+
+def shape_tolerance(zoom):
+    """
+    The coarsest cached PrecinctShape tolerance that still looks right at zoom.
+    """
+    if zoom >= 15:
+        return 0.0001
+    elif zoom >= 14:
+        return 0.0005
+    return 0.001
+
+
+def cluster_coordinators(queryset, zoom, chunk_size=1000):
+    """
+    Buckets the coordinators in queryset into a zoom-dependent lon/lat grid,
+    returning one cluster per occupied cell with a count per status.
+    """
+    cell_size = 360.0 / (2 ** zoom) / CELLS_PER_TILE
+    cells = {}
+
+    def add(rows):
+        centroids = PrecinctShape.objects.lookup(set(precinct_id for precinct_id, status in rows), shape_tolerance(zoom))
+        for precinct_id, status in rows:
+            if precinct_id not in centroids:
+                continue
+            geojson, x, y = centroids[precinct_id]
+            cell = cells.setdefault((int(math.floor(x / cell_size)), int(math.floor(y / cell_size))), {'count': 0, 'x': 0.0, 'y': 0.0, 'statuses': Counter()})
+            cell['count'] += 1
+            cell['x'] += x
+            cell['y'] += y
+            cell['statuses'][status or ''] += 1
+
+    for chunk in iter_cursor_chunks(queryset, ['precinct_id', 'status'], chunk_size):
+        add(chunk)
+
+    return [{
+        'centroid': [cell['x'] / cell['count'], cell['y'] / cell['count']],
+        'count': cell['count'],
+        'statuses': dict(cell['statuses']),
+    } for cell in cells.values()]
@@ -0,0 +1,44 @@
+"""
+Reading big querysets a chunk at a time through PostgreSQL server-side cursors.
+
+Django 1.10's iterator() still has psycopg2 fetch the whole result before the
+first row, so "all of Washington" would be held in memory at once.
+"""
+import uuid
+
+from django.db import connections, transaction
+from django.db.models.sql.datastructures import EmptyResultSet
+
+
+def iter_cursor_chunks(queryset, fields, chunk_size=2000):
+    """
+    Yields lists of up to chunk_size queryset.values_list(*fields) rows, read
+    through a named (server-side) cursor in queryset's own order.
+    """
+    queryset = queryset.values_list(*fields)
+    try:
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    except EmptyResultSet:
+        return
+
+    connection = connections[queryset.db]
+    # named cursors only live inside a transaction
+    with transaction.atomic(using=queryset.db):
+        connection.ensure_connection()
+        cursor = connection.connection.cursor(name='chunks_%s' % uuid.uuid4().hex)
+        try:
+            cursor.itersize = chunk_size
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+
+def iter_cursor_rows(queryset, fields, chunk_size=2000):
+    for rows in iter_cursor_chunks(queryset, fields, chunk_size):
+        for row in rows:
+            yield row
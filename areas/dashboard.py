@@ -0,0 +1,64 @@
+from django.core.cache import cache
+
+from .models import Area, AreaStatusCount, StatusChange, STATUSES, COORDINATOR_VERSION_KEY, DASHBOARD_CACHE_KEY, cache_version
+
+
+RECENT_ACTIVITY = 25
+
+# the cache is per process; old versions' entries just age out
+DASHBOARD_CACHE_TIMEOUT = 300
+
+
+def dashboard_data():
+    """
+    The area x status matrix and recent activity. Built from AreaStatusCount (one
+    row per area and status, however many coordinators there are) and cached
+    under the coordinator version, which every write to the counters moves.
+    """
+    key = DASHBOARD_CACHE_KEY % cache_version(COORDINATOR_VERSION_KEY)
+    data = cache.get(key)
+    if data is None:
+        data = build_dashboard_data()
+        cache.set(key, data, DASHBOARD_CACHE_TIMEOUT)
+    return data
+
+
+def build_dashboard_data():
+    counts = {}
+    for area_id, status, count in AreaStatusCount.objects.values_list('area_id', 'status', 'count'):
+        counts[(area_id, status)] = count
+
+    areas = [(area.pk, area.name, area.color) for area in Area.objects.order_by('name')]
+    if any(area_id is None for area_id, status in counts):
+        areas.append((None, 'No Area', ''))
+
+    rows = []
+    for area_id, name, color in areas:
+        cells = [counts.get((area_id, status), 0) for status, label in STATUSES]
+        total = sum(cells)
+        walking = total - counts.get((area_id, 'will-not-walk'), 0)
+        done = counts.get((area_id, 'data-entered'), 0)
+        rows.append({
+            'area_id': area_id,
+            'name': name,
+            'color': color,
+            'cells': cells,
+            'total': total,
+            'completion': int(round(100.0 * done / walking)) if walking else 0,
+        })
+
+    activity = [{
+        'coordinator': change.coordinator.full_name if change.coordinator else '(deleted)',
+        'area': change.area.name if change.area else '',
+        'old_status': change.get_old_status_display(),
+        'new_status': change.get_new_status_display(),
+        'changed_by': change.changed_by.get_full_name() or change.changed_by.username if change.changed_by else '',
+        'changed_at': change.changed_at,
+    } for change in StatusChange.objects.select_related('coordinator', 'area', 'changed_by')[:RECENT_ACTIVITY]]
+
+    return {
+        'statuses': [label for status, label in STATUSES],
+        'rows': rows,
+        'totals': [sum(row['cells'][i] for row in rows) for i in range(len(STATUSES))],
+        'activity': activity,
+    }
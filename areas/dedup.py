@@ -0,0 +1,230 @@
+"""
+Finding and merging coordinators who were loaded more than once, under a
+differently cased email, a differently formatted phone number or a nickname.
+
+Rows are only compared within blocks that share a key (email, a phone number,
+or the phonetic name within a precinct), so the work grows with the size of
+the blocks rather than the square of the table. A pair is only a duplicate if
+it also shares an email or phone number: two people with the same name in the
+same precinct are just neighbors.
+"""
+from collections import defaultdict
+from itertools import combinations
+
+from django.db import transaction
+
+from .models import ImportRecord, PhoneNumber, PrecinctCoordinator, StatusChange, STATUS_PROGRESS
+from .phones import normalize_phone_number
+from .voterindex import canonical_first_name, normalize_name, soundex
+
+
+DEFAULT_THRESHOLD = 0.6
+
+# bigger blocks (a shared office phone, a blank name) say too little to be worth comparing all pairs
+MAX_BLOCK_SIZE = 100
+
+SCORE_EMAIL = 0.5
+SCORE_PHONE = 0.4
+SCORE_LAST_NAME = 0.25
+SCORE_LAST_NAME_SOUNDEX = 0.15
+SCORE_FIRST_NAME = 0.2
+SCORE_FIRST_NAME_SOUNDEX = 0.1
+SCORE_PRECINCT = 0.15
+# two people sharing a household phone and last name aren't one person
+PENALTY_FIRST_NAME = -0.5
+
+
+def split_name(full_name):
+    parts = (full_name or '').split()
+    if not parts:
+        return '', ''
+    return parts[0], parts[-1] if len(parts) > 1 else ''
+
+
+class DisjointSet(object):
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        parent = self.parent.setdefault(item, item)
+        if parent != item:
+            parent = self.parent[item] = self.find(parent)
+        return parent
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+    def groups(self):
+        groups = defaultdict(list)
+        for item in self.parent:
+            groups[self.find(item)].append(item)
+        return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+class DuplicateFinder(object):
+    """
+    Blocks, scores and clusters the coordinators in queryset (everyone by default).
+    """
+
+    def __init__(self, queryset=None, threshold=DEFAULT_THRESHOLD, max_block_size=MAX_BLOCK_SIZE):
+        self.queryset = queryset if queryset is not None else PrecinctCoordinator.objects.all()
+        self.threshold = threshold
+        self.max_block_size = max_block_size
+        self.records = {}
+        self.blocks = defaultdict(list)
+        self.skipped_blocks = 0
+        self.compared = 0
+        # {(a, b): score} for the pairs that were joined
+        self.scores = {}
+
+    def load(self):
+        phones = defaultdict(set)
+        for coordinator_id, number in PhoneNumber.objects.filter(coordinator__in=self.queryset.values('pk')).values_list('coordinator_id', 'number').iterator():
+            phones[coordinator_id].add(number)
+
+        for pk, full_name, email, precinct_id in self.queryset.order_by().values_list('pk', 'full_name', 'email', 'precinct_id').iterator():
+            first, last = split_name(full_name)
+            first = canonical_first_name(first)
+            # soundex of the canonical name, so Bob and Robert share a name block
+            record = (first, soundex(first), normalize_name(last), soundex(last),
+                      (email or '').strip().lower(), precinct_id, frozenset(phones.get(pk, ())))
+            self.records[pk] = record
+
+            first_name, first_soundex, last_name, last_soundex, email, precinct_id, numbers = record
+            if email:
+                self.blocks[('email', email)].append(pk)
+            for number in numbers:
+                self.blocks[('phone', number)].append(pk)
+            if last_soundex:
+                self.blocks[('name', precinct_id, first_soundex, last_soundex)].append(pk)
+        return self
+
+    def candidate_pairs(self):
+        seen = set()
+        for key, pks in self.blocks.items():
+            if len(pks) < 2:
+                continue
+            if len(pks) > self.max_block_size:
+                self.skipped_blocks += 1
+                continue
+            for pair in combinations(sorted(pks), 2):
+                if pair not in seen:
+                    seen.add(pair)
+                    yield pair
+
+    def score(self, a, b):
+        a_first, a_first_soundex, a_last, a_last_soundex, a_email, a_precinct, a_phones = self.records[a]
+        b_first, b_first_soundex, b_last, b_last_soundex, b_email, b_precinct, b_phones = self.records[b]
+
+        score = 0.0
+        if a_email and a_email == b_email:
+            score += SCORE_EMAIL
+        if a_phones & b_phones:
+            score += SCORE_PHONE
+        if a_last and a_last == b_last:
+            score += SCORE_LAST_NAME
+        elif a_last_soundex and a_last_soundex == b_last_soundex:
+            score += SCORE_LAST_NAME_SOUNDEX
+        if a_first and a_first == b_first:
+            score += SCORE_FIRST_NAME
+        elif a_first_soundex and a_first_soundex == b_first_soundex:
+            score += SCORE_FIRST_NAME_SOUNDEX
+        elif a_first and b_first:
+            score += PENALTY_FIRST_NAME
+        if a_precinct == b_precinct:
+            score += SCORE_PRECINCT
+        return score
+
+    def shares_contact(self, a, b):
+        a_email, a_phones = self.records[a][4], self.records[a][6]
+        b_email, b_phones = self.records[b][4], self.records[b][6]
+        return bool((a_email and a_email == b_email) or a_phones & b_phones)
+
+    def clusters(self):
+        """
+        Lists of coordinator ids, lowest first, that are likely the same person.
+        """
+        if not self.records:
+            self.load()
+        duplicates = DisjointSet()
+        for a, b in self.candidate_pairs():
+            self.compared += 1
+            score = self.score(a, b)
+            if score >= self.threshold and self.shares_contact(a, b):
+                self.scores[(a, b)] = score
+                duplicates.union(a, b)
+        return sorted(duplicates.groups())
+
+    def cluster_score(self, cluster):
+        """
+        The weakest score that joined the cluster.
+        """
+        return min(self.scores[pair] for pair in combinations(sorted(cluster), 2) if pair in self.scores)
+
+
+def pick_survivor(coordinators):
+    """
+    The coordinator furthest along, or else the first loaded.
+    """
+    return max(coordinators, key=lambda c: (STATUS_PROGRESS.index(c.status) if c.status in STATUS_PROGRESS else 0, -c.pk))
+
+
+def merge_coordinators(coordinators):
+    """
+    Folds coordinators into pick_survivor(coordinators): empty fields are filled in,
+    phone numbers and notes combined, affiliations, status history and import records
+    moved over.
+    Deletes the rest (coordinator_deleted does their bookkeeping); returns
+    (survivor, deleted coordinators).
+    """
+    survivor = pick_survivor(coordinators)
+    others = [c for c in coordinators if c.pk != survivor.pk]
+
+    numbers = [line for line in (survivor.phone_number or '').split('\n') if line.strip()]
+    known_numbers = set(normalize_phone_number(line) or line for line in numbers)
+    notes = [survivor.notes] if survivor.notes else []
+    for other in others:
+        survivor.full_name = survivor.full_name or other.full_name
+        survivor.email = survivor.email or other.email
+        survivor.mini_van = survivor.mini_van or other.mini_van
+        for line in (other.phone_number or '').split('\n'):
+            number = normalize_phone_number(line) or line
+            if line.strip() and number not in known_numbers:
+                known_numbers.add(number)
+                numbers.append(line)
+        if other.email and other.email.lower() != (survivor.email or '').lower():
+            notes.append('Also: %s' % other.email)
+        if other.notes and other.notes not in notes:
+            notes.append(other.notes)
+    survivor.phone_number = '\n'.join(numbers) or None
+    survivor.notes = '\n\n'.join(notes) or None
+
+    other_ids = [other.pk for other in others]
+    Through = PrecinctCoordinator.affiliations.through
+    affiliation_ids = set(Through.objects.filter(precinctcoordinator_id__in=other_ids).values_list('affiliation_id', flat=True))
+
+    survivor.save()
+    if affiliation_ids:
+        survivor.affiliations.add(*affiliation_ids)
+    StatusChange.objects.filter(coordinator_id__in=other_ids).update(coordinator=survivor)
+    # so re-imports update the survivor rather than recreating the duplicates
+    ImportRecord.objects.filter(coordinator_id__in=other_ids).update(coordinator=survivor)
+    PrecinctCoordinator.objects.filter(pk__in=other_ids).delete()
+    return survivor, others
+
+
+def merge_clusters(clusters):
+    """
+    Merges each cluster of coordinator ids in one transaction. Returns how many
+    coordinators were merged away.
+    """
+    coordinators = PrecinctCoordinator.objects.in_bulk([pk for cluster in clusters for pk in cluster])
+    merged = 0
+    with transaction.atomic():
+        for cluster in clusters:
+            survivor, deleted = merge_coordinators([coordinators[pk] for pk in cluster if pk in coordinators])
+            merged += len(deleted)
+    return merged
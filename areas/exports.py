@@ -0,0 +1,103 @@
+"""
+Streaming CSV and XLSX exports of coordinator lists, for printing and phone
+banking.
+
+Rows come off a server-side cursor a chunk at a time (see cursors.py), so
+exporting every coordinator takes no more memory than exporting ten.
+"""
+from collections import defaultdict
+import csv
+import tempfile
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .cursors import iter_cursor_chunks
+from .models import Affiliation, PhoneNumber, STATUSES
+from .phones import format_phone_number, unparsed_phone_text
+
+
+EXPORT_FIELDS = ['pk', 'full_name', 'email', 'phone_number', 'status', 'precinct__long_name', 'area__name', 'affiliation_mask', 'mini_van', 'notes']
+EXPORT_HEADERS = ['ID', 'Name', 'Email', 'Phone Numbers', 'Status', 'Precinct', 'Area', 'Affiliations', 'MiniVAN', 'Notes']
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+EXPORT_FORMATS = sorted(CONTENT_TYPES)
+
+
+def iter_export_rows(queryset, chunk_size=2000):
+    """
+    Yields one row of EXPORT_HEADERS' columns per coordinator in queryset, with
+    parsed phone numbers looked up a chunk at a time.
+    """
+    statuses = dict(STATUSES)
+    for rows in iter_cursor_chunks(queryset, EXPORT_FIELDS, chunk_size):
+        phones = defaultdict(list)
+        for coordinator_id, number in PhoneNumber.objects.filter(coordinator_id__in=[row[0] for row in rows]) \
+                                                         .order_by('position').values_list('coordinator_id', 'number'):
+            phones[coordinator_id].append(format_phone_number(number))
+
+        for pk, full_name, email, phone_number, status, precinct_name, area_name, affiliation_mask, mini_van, notes in rows:
+            # anything we couldn't parse a number out of is exported as entered
+            if pk in phones:
+                numbers = phones[pk] + unparsed_phone_text(phone_number)
+            else:
+                numbers = [line.strip() for line in (phone_number or '').split('\n') if line.strip()]
+            yield [pk, full_name or '', email or '', '; '.join(numbers), statuses.get(status, status), precinct_name,
+                   area_name or '', ', '.join(Affiliation.labels_for(affiliation_mask)), 'Yes' if mini_van else '', notes or '']
+
+
+class Echo(object):
+    """
+    A file-like object for csv.writer that hands back what it's given.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, rows_per_chunk=500):
+    writer = csv.writer(Echo())
+    chunk = [writer.writerow(EXPORT_HEADERS)]
+    for row in rows:
+        chunk.append(writer.writerow([unicode(value).encode('utf-8') for value in row]))
+        if len(chunk) >= rows_per_chunk:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+
+
+def iter_xlsx(rows, chunk_size=64 * 1024):
+    """
+    Writes rows into a write-only workbook, which spills them to disk as it goes,
+    then streams the finished file. Nothing can be sent until the workbook is
+    complete, so CSV is the better choice for the very largest exports.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Coordinators')
+    sheet.append(EXPORT_HEADERS)
+    for row in rows:
+        sheet.append([ILLEGAL_CHARACTERS_RE.sub('', value) if isinstance(value, basestring) else value for value in row])
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        for chunk in iter(lambda: output.read(chunk_size), ''):
+            yield chunk
+
+
+def export_response(queryset, output_format):
+    """
+    A StreamingHttpResponse downloading the coordinators in queryset as
+    output_format, one of EXPORT_FORMATS.
+    """
+    render = iter_xlsx if output_format == 'xlsx' else iter_csv
+    response = StreamingHttpResponse(render(iter_export_rows(queryset)), content_type=CONTENT_TYPES[output_format])
+    response['Content-Disposition'] = 'attachment; filename="coordinators-%s.%s"' % (
+        timezone.localtime(timezone.now()).strftime('%Y-%m-%d-%H%M'), output_format)
+    return response
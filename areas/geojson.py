@@ -0,0 +1,84 @@
+import json
+
+from .cursors import iter_cursor_chunks, iter_cursor_rows
+from .models import PrecinctShape, WaPrecinct, DEFAULT_SHAPE_TOLERANCE
+from . import topojson
+
+
+COORDINATOR_FEATURE_FIELDS = ['pk', 'full_name', 'phone_number', 'email', 'status', 'precinct_id', 'precinct__long_name', 'area__color']
+
+
+def iter_feature_collection(features):
+    """
+    Yields a GeoJSON FeatureCollection piece by piece, given an iterable of
+    already-serialized Feature strings.
+    """
+    yield '{"type": "FeatureCollection", "features": ['
+    separator = ''
+    for feature in features:
+        yield separator + feature
+        separator = ','
+    yield ']}'
+
+
+def iter_coordinator_features(queryset, tolerance=DEFAULT_SHAPE_TOLERANCE, chunk_size=500):
+    """
+    Yields one serialized Feature per coordinator in queryset, drawing precinct
+    shapes from the PrecinctShape cache a chunk at a time so memory stays flat.
+    """
+    for chunk in iter_cursor_chunks(queryset, COORDINATOR_FEATURE_FIELDS, chunk_size):
+        for feature in _serialize_chunk(chunk, tolerance):
+            yield feature
+
+
+def _serialize_chunk(rows, tolerance):
+    if not rows:
+        return
+    shapes = PrecinctShape.objects.lookup(set(row[5] for row in rows), tolerance)
+    for pk, full_name, phone_number, email, status, precinct_id, precinct_name, color in rows:
+        shape = shapes.get(precinct_id)
+        if not shape:
+            continue
+        geojson, centroid_x, centroid_y = shape
+        properties = json.dumps({
+            'id': pk,
+            'full_name': full_name,
+            'phone_number': phone_number,
+            'email': email,
+            'status': status,
+            'precinct': precinct_name,
+            'color': color,
+            'centroid': [centroid_x, centroid_y],
+        })
+        yield '{"type": "Feature", "properties": %s, "geometry": %s}' % (properties, geojson)
+
+
+def precinct_topology(precinct_ids, properties=None, tolerance=DEFAULT_SHAPE_TOLERANCE):
+    """
+    A TopoJSON Topology of the given precincts, built from their full geometry and
+    simplified arc by arc, with properties[precinct_id] attached to each precinct.
+    """
+    properties = properties or {}
+    geometries = WaPrecinct.objects.filter(pk__in=precinct_ids).exclude(map_cache_geometry=None) \
+                                   .values_list('id', 'map_cache_geometry').iterator()
+    return topojson.encode(
+        ((precinct_id, properties.get(precinct_id, {}), json.loads(geometry.transform(4326, clone=True).json))
+         for precinct_id, geometry in geometries),
+        simplify=tolerance,
+    )
+
+
+def coordinator_topology(queryset, tolerance=DEFAULT_SHAPE_TOLERANCE):
+    """
+    The coordinators in queryset as one TopoJSON Topology: each precinct appears
+    once, with its coordinators listed in its properties.
+    """
+    properties = {}
+    for pk, full_name, phone_number, email, status, precinct_id, precinct_name, color in iter_cursor_rows(queryset, COORDINATOR_FEATURE_FIELDS):
+        precinct = properties.setdefault(precinct_id, {'precinct': precinct_name, 'color': color, 'coordinators': []})
+        precinct['coordinators'].append({'id': pk, 'full_name': full_name, 'phone_number': phone_number, 'email': email, 'status': status})
+
+    for precinct_id, (geojson, centroid_x, centroid_y) in PrecinctShape.objects.lookup(properties.keys(), tolerance).items():
+        properties[precinct_id]['centroid'] = [centroid_x, centroid_y]
+
+    return precinct_topology(properties.keys(), properties, tolerance)
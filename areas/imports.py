@@ -0,0 +1,124 @@
+"""
+The import ledger behind the nightly coordinator re-imports: for every row of
+an export, keyed within its source, the hash of what it said last time and the
+coordinator it became. A re-run only looks up and writes the rows that are new
+or changed.
+"""
+from collections import Counter
+import hashlib
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AreaPrecinct, ImportRecord, PrecinctCoordinator
+
+
+def row_key(line, key_fields):
+    return '|'.join((line.get(field) or '').strip().lower() for field in key_fields)[:255]
+
+
+def row_hash(line, hash_fields):
+    return hashlib.sha1('\x1f'.join((line.get(field) or '') for field in hash_fields)).hexdigest()
+
+
+class ImportLedger(object):
+
+    def __init__(self, source, key_fields, hash_fields, batch_size=1000):
+        self.source = source
+        self.key_fields = key_fields
+        self.hash_fields = sorted(hash_fields)
+        self.batch_size = batch_size
+        # {key: (content_hash, coordinator_id, removed_at)}
+        self.known = dict((key, (content_hash, coordinator_id, removed_at)) for key, content_hash, coordinator_id, removed_at in
+                          ImportRecord.objects.filter(source=source).values_list('source_key', 'content_hash', 'coordinator_id', 'removed_at').iterator())
+        self.seen = set()
+        self.pending = {}
+        self.counts = Counter()
+
+    def sort(self, lines):
+        """
+        Returns the rows worth importing as (added, changed), lists of
+        (line, key, content_hash), and counts the rest as unchanged. A changed
+        row whose coordinator has since been deleted counts as added.
+        """
+        added, changed = [], []
+        for line in lines:
+            key = row_key(line, self.key_fields)
+            if key in self.seen:
+                # the same row twice in one export; summary() reports how many
+                self.counts['repeated'] += 1
+                continue
+            self.seen.add(key)
+
+            content_hash = row_hash(line, self.hash_fields)
+            known = self.known.get(key)
+            if known is None:
+                added.append((line, key, content_hash))
+            elif known[0] == content_hash:
+                self.counts['unchanged'] += 1
+            elif known[1] is None:
+                added.append((line, key, content_hash))
+            else:
+                changed.append((line, key, content_hash))
+
+        self.counts['added'] += len(added)
+        self.counts['changed'] += len(changed)
+        return added, changed
+
+    def coordinator_id(self, key):
+        return self.known[key][1]
+
+    def record(self, key, content_hash, coordinator_id):
+        self.pending[key] = (content_hash, coordinator_id)
+
+    def save(self, complete=True):
+        """
+        Writes the recorded rows. When this run read the whole export (complete),
+        also marks the source's rows missing from it as removed, once; coordinators
+        themselves are never deleted.
+        """
+        now = timezone.now()
+        removed = [key for key, (content_hash, coordinator_id, removed_at) in self.known.items()
+                   if complete and key not in self.seen and removed_at is None]
+        returned = [key for key in self.seen if key in self.known and self.known[key][2] is not None and key not in self.pending]
+        records = ImportRecord.objects.filter(source=self.source)
+
+        with transaction.atomic():
+            replaced = [key for key in self.pending if key in self.known]
+            for start in range(0, len(replaced), self.batch_size):
+                records.filter(source_key__in=replaced[start:start + self.batch_size]).delete()
+            ImportRecord.objects.bulk_create([
+                ImportRecord(source=self.source, source_key=key, content_hash=content_hash, coordinator_id=coordinator_id)
+                for key, (content_hash, coordinator_id) in self.pending.items()
+            ], batch_size=self.batch_size)
+
+            for start in range(0, len(returned), self.batch_size):
+                records.filter(source_key__in=returned[start:start + self.batch_size]).update(removed_at=None)
+            for start in range(0, len(removed), self.batch_size):
+                records.filter(source_key__in=removed[start:start + self.batch_size]).update(removed_at=now)
+        self.counts['removed'] = len(removed)
+
+    def summary(self):
+        return 'added %(added)s, changed %(changed)s, unchanged %(unchanged)s, removed %(removed)s, repeated %(repeated)s' % self.counts
+
+
+def update_coordinators(updates):
+    """
+    Applies [(coordinator_id, {attname: value})] from changed rows through
+    PrecinctCoordinator.save_changed(); returns how many coordinators really changed.
+    """
+    coordinators = PrecinctCoordinator.objects.in_bulk([pk for pk, data in updates])
+    changes = []
+    for pk, data in updates:
+        coordinator = coordinators.get(pk)
+        if coordinator is None:
+            continue
+        if data.get('precinct_id', coordinator.precinct_id) != coordinator.precinct_id:
+            data = dict(data, area_id=AreaPrecinct.area_id_for(data['precinct_id']))
+        attnames = [name for name, value in data.items() if getattr(coordinator, name) != value]
+        for name in attnames:
+            setattr(coordinator, name, data[name])
+        if attnames:
+            changes.append((coordinator, attnames))
+    PrecinctCoordinator.save_changed(changes)
+    return len(changes)
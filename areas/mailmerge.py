@@ -0,0 +1,163 @@
+"""
+Outreach messages to precinct coordinators, picked by the coordinator's status and
+affiliation class and merged with their details.
+
+Templates are compiled once, at import: the plain text for sending in bulk, and
+a copy with its newlines already encoded for mailto: links.
+"""
+from collections import namedtuple
+
+from django.utils.html import mark_safe
+
+from .models import Affiliation
+
+
+PCO_AFFILIATIONS = frozenset(['elected', 'appointed', 'acting', 'elected-post-reorg'])
+
+# what we call a coordinator of each affiliation class, and how sure we are they'll walk
+AFFILIATION_CLASSES = {
+    'elected': {'descriptor': 'PCOs', 'verb': 'planning on'},
+    'pco': {'descriptor': 'PCOs', 'verb': 'interested in'},
+    'delegate': {'descriptor': 'precinct delegates who caucused with us in March,', 'verb': 'interested in'},
+    'volunteer': {'descriptor': 'volunteers', 'verb': 'interested in'},
+}
+
+MAILTO_NEWLINE = '%0D%0A'
+
+
+def affiliation_class(slugs):
+    """
+    Classifies a coordinator by the slugs of their affiliations.
+    """
+    slugs = set(slugs)
+    if 'elected' in slugs:
+        return 'elected'
+    elif slugs & PCO_AFFILIATIONS:
+        return 'pco'
+    elif 'delegate' in slugs:
+        return 'delegate'
+    return 'volunteer'
+
+
+Message = namedtuple('Message', ['subject', 'body'])
+
+
+class MessageTemplate(object):
+
+    def __init__(self, subject, body):
+        self.subject = subject
+        self.body = body
+        # escaped, as the encoded newline is itself a %-format
+        self.mailto_subject = subject.replace('\n', MAILTO_NEWLINE.replace('%', '%%'))
+        self.mailto_body = body.replace('\n', MAILTO_NEWLINE.replace('%', '%%'))
+
+    def render(self, context):
+        return Message(self.subject % context, self.body % context)
+
+    def render_mailto(self, context):
+        # merged values may have newlines of their own
+        return Message((self.mailto_subject % context).replace('\n', MAILTO_NEWLINE),
+                       (self.mailto_body % context).replace('\n', MAILTO_NEWLINE))
+
+
+# {(status, affiliation class): template}; a class of None covers every class
+MESSAGES = {
+    (None, None): MessageTemplate(
+        "[46 Dems] %(first_name)s, are you %(verb)s walking your precinct?",
+        """Hi %(first_name)s,
+
+My name is %(author_name)s, I'm a volunteer with the 46th District Democrats.
+
+Election Day is just around the corner, and we are excited to be ramping up our Get Out the Vote efforts in the 46th. We are reaching out to %(descriptor)s and wondered if you'd be interested in walking your precinct, %(precinct_name)s? It would be a huge help toward turning out Democratic voters in your neighborhood, and with your help, we will win big on Election Day.
+
+We have got a packet with a walk list and literature all ready to go. We can also set you up with a mobile phone app called MiniVAN, which makes walking your precinct a breeze.
+
+Let me know if you're interested, and we'll get you all setup. We'd love to have your help in making this election a big success for Democrats.
+
+Thanks, %(first_name)s!
+
+%(author_name)s"""),
+
+    ('will-walk', None): MessageTemplate(
+        "%(first_name)s, your walk packet for %(precinct_name)s is ready for pickup",
+        """Hi %(first_name)s,
+
+Just a friendly heads up -- your precinct walk packet is available for pickup.
+
+
+
+Please make a plan to scoop it up and walk your precinct (and let me know if you have any questions!)
+
+Thanks!
+
+%(author_name)s"""),
+
+    ('picked-up-packet', None): MessageTemplate(
+        "How's it going?",
+        """Hey %(first_name)s,
+
+Just checking in -- have you been able to walk your precinct?
+
+Thanks!
+
+%(author_name)s"""),
+}
+
+
+class MailMerge(object):
+    """
+    Merges MESSAGES for coordinators on behalf of one author.
+    """
+
+    def __init__(self, author_name, messages=MESSAGES):
+        self.author_name = author_name
+        self.messages = messages
+
+    def template_for(self, status, affiliation_class):
+        # a blank status is no status, as far as what we say goes
+        status = status or None
+        return self.messages.get((status, affiliation_class)) or self.messages.get((status, None))
+
+    def prepare(self, coordinator):
+        """
+        Returns (template, context) for a coordinator, or (None, None) when there's
+        nothing to say to them at their status.
+        """
+        klass = affiliation_class(Affiliation.slugs_for(coordinator.affiliation_mask))
+        template = self.template_for(coordinator.status, klass)
+        if template is None:
+            return None, None
+
+        context = dict(AFFILIATION_CLASSES[klass],
+                       first_name=(coordinator.full_name or '').split(' ')[0],
+                       precinct_name=coordinator.precinct.long_name,
+                       author_name=self.author_name)
+        return template, context
+
+    def message(self, coordinator):
+        template, context = self.prepare(coordinator)
+        return template.render(context) if template else None
+
+    def messages_for(self, coordinators):
+        """
+        Yields (coordinator, Message) for every coordinator with an email address
+        and something to say to them, for sending in bulk.
+        """
+        for coordinator in coordinators:
+            if coordinator.email:
+                message = self.message(coordinator)
+                if message:
+                    yield coordinator, message
+
+    def mailto(self, coordinator):
+        """
+        An HTML mailto: link to the coordinator, prefilled with their message.
+        """
+        if not coordinator.email:
+            return ''
+        template, context = self.prepare(coordinator)
+        query = ''
+        if template:
+            message = template.render_mailto(context)
+            query = '?body=%s&subject=%s' % (message.body, message.subject)
+        return mark_safe('<a href="mailto:%(email)s%(query)s" target="_blank">%(email)s</a>' % {'email': coordinator.email, 'query': query})
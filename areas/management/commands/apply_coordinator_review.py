@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from areas.imports import ImportLedger, row_hash, row_key
+from areas.nationbuilder import LEDGER_SOURCE, PrecinctFinder, coordinator_data, create_coordinator, ledger_fields
+import csv
+
+
+class Command(BaseCommand):
+    help = 'Load the coordinators from a reviewed load_coordinators_from_nationbuilder review file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('filename', type=str, help='A review CSV whose "choice" column holds the matching candidate\'s number (or "skip")')
+
+    def handle(self, *args, **options):
+        created_count = not_created_count = skipped_count = 0
+
+        try:
+            with open(options['filename'], 'rU') as file:
+                lines = list(csv.DictReader(file))
+        except IOError as e:
+            raise CommandError("Could not open CSV file '%s': \"%s\". Double-check that filename and path?" % (options['filename'], e))
+
+        finder = PrecinctFinder()
+        key_fields, hash_fields = ledger_fields(lines[0].keys() if lines else [])
+        ledger = ImportLedger(LEDGER_SOURCE, key_fields, hash_fields)
+        with transaction.atomic():
+            for line in lines:
+                choice = line['choice'].strip()
+                codes = line['candidate_precinct_codes'].split(';')
+                if not choice.isdigit() or not 1 <= int(choice) <= len(codes):
+                    skipped_count += 1
+                    continue
+
+                coordinator, created = create_coordinator(coordinator_data(line), finder.by_voter_code(codes[int(choice) - 1]))
+                # so the next nightly import knows this row
+                ledger.record(row_key(line, key_fields), row_hash(line, ledger.hash_fields), coordinator.pk)
+                if created:
+                    created_count += 1
+                else:
+                    not_created_count += 1
+            ledger.save(complete=False)
+
+        self.stdout.write(self.style.SUCCESS('SUCCESS: Created %s coordinators (did not create %s, skipped %s)' % (created_count, not_created_count, skipped_count)))
@@ -0,0 +1,45 @@
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand
+from areas.models import WaPrecinct
+from areas.resolver import PrecinctResolver
+import random
+import time
+
+
+class Command(BaseCommand):
+    help = 'Compare the in-memory precinct resolver against one PostGIS ST_Contains query per point.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=2000, help='How many random points to resolve')
+        parser.add_argument('--seed', type=int, default=46)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+
+        started = time.time()
+        resolver = PrecinctResolver()
+        load_time = time.time() - started
+
+        # sample points inside the bounding box of a random precinct, so most of them land somewhere
+        extents = resolver.extents.values()
+        points = []
+        for i in range(options['points']):
+            xmin, ymin, xmax, ymax = random.choice(extents)
+            points.append((random.uniform(ymin, ymax), random.uniform(xmin, xmax)))
+
+        started = time.time()
+        in_memory = resolver.resolve(points)
+        resolver_time = time.time() - started
+
+        started = time.time()
+        postgis = [
+            WaPrecinct.objects.filter(map_cache_geometry__contains=Point(longitude, latitude, srid=4326)).values_list('id', flat=True).first()
+            for latitude, longitude in points
+        ]
+        postgis_time = time.time() - started
+
+        disagreements = sum(1 for a, b in zip(in_memory, postgis) if a != b)
+        self.stdout.write('Loaded %s precincts in %.2fs' % (len(resolver.names), load_time))
+        self.stdout.write('Resolver: %s points in %.3fs (%.0f points/sec)' % (len(points), resolver_time, len(points) / resolver_time if resolver_time else 0))
+        self.stdout.write('PostGIS:  %s points in %.3fs (%.0f points/sec)' % (len(points), postgis_time, len(points) / postgis_time if postgis_time else 0))
+        self.stdout.write('Speedup:  %.1fx, %s disagreements (points on shared borders)' % (postgis_time / resolver_time if resolver_time else 0, disagreements))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from areas.voterindex import VoterIndex, VOTER_FIELDS
+import os
+import records
+import time
+
+
+class Command(BaseCommand):
+    help = 'Build a local phonetic voter index for one legislative district, for offline precinct matching.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', type=str, help='Where to write the index file')
+        parser.add_argument('--district', type=str, default='46', help='Legislative district to index')
+
+    def handle(self, *args, **options):
+        started = time.time()
+        VoterDB = records.Database(os.environ['VOTER_REGISTRATION_DATABASE'])
+        voters = VoterDB.query('SELECT %s FROM wa_voter WHERE legislativedistrict = :legislative_district' % ', '.join(VOTER_FIELDS), legislative_district=options['district'])
+
+        index = VoterIndex.build(dict((field, voter[field]) for field in VOTER_FIELDS) for voter in voters)
+        index.save(options['output'])
+
+        self.stdout.write(self.style.SUCCESS('SUCCESS: Indexed %s voters in LD %s to %s (%s KB, %.1fs)' % (
+            len(index), options['district'], options['output'], os.path.getsize(options['output']) / 1024, time.time() - started)))
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from areas.models import WaPrecinct, PrecinctShape, SHAPE_TOLERANCES
+from areas.tiles import clear_tile_cache
+
+
+class Command(BaseCommand):
+    help = 'Precompute simplified GeoJSON and centroids for every precinct geometry.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', default=False, help='Rebuild every shape, not just missing or stale ones')
+        parser.add_argument('--chunk-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        # hash the geometry in the database so we only pull the polygons we need to rebuild.
+        current = dict(WaPrecinct.objects.exclude(map_cache_geometry=None)
+                                         .extra(select={'geometry_hash': 'md5(ST_AsBinary(map_cache_geometry))'})
+                                         .values_list('id', 'geometry_hash'))
+
+        cached = {}
+        for precinct_id, tolerance, geometry_hash in PrecinctShape.objects.values_list('precinct_id', 'tolerance', 'geometry_hash'):
+            cached.setdefault(precinct_id, {})[tolerance] = geometry_hash
+
+        stale = []
+        redrawn = []
+        for precinct_id, geometry_hash in current.iteritems():
+            shapes = cached.get(precinct_id, {})
+            if options['force'] or any(shapes.get(t) != geometry_hash for t in SHAPE_TOLERANCES):
+                stale.append(precinct_id)
+            if any(shapes.get(t) not in (None, geometry_hash) for t in SHAPE_TOLERANCES):
+                # its geometry was changed under us, e.g. by a reload of wa_precincts
+                redrawn.append(precinct_id)
+
+        # precincts that lost their geometry (or went away) shouldn't keep serving old shapes.
+        orphaned = set(cached) - set(current)
+        if orphaned:
+            PrecinctShape.objects.filter(precinct_id__in=orphaned).delete()
+
+        chunk_size = options['chunk_size']
+        for start in range(0, len(stale), chunk_size):
+            chunk = stale[start:start + chunk_size]
+            shapes = []
+            for precinct in WaPrecinct.objects.filter(pk__in=chunk).iterator():
+                geometry = precinct.map_cache_geometry.transform(4326, clone=True)
+                centroid = geometry.centroid
+                for tolerance in SHAPE_TOLERANCES:
+                    shapes.append(PrecinctShape(
+                        precinct_id=precinct.pk,
+                        tolerance=tolerance,
+                        geojson=geometry.simplify(tolerance).json,
+                        centroid_x=centroid.x,
+                        centroid_y=centroid.y,
+                        geometry_hash=current[precinct.pk],
+                    ))
+
+            with transaction.atomic():
+                PrecinctShape.objects.filter(precinct_id__in=chunk).delete()
+                PrecinctShape.objects.bulk_create(shapes)
+
+            self.stdout.write('Cached %s of %s precincts' % (min(start + chunk_size, len(stale)), len(stale)))
+
+        if stale or orphaned:
+            WaPrecinct.shapes_changed(stale + list(orphaned))
+        if redrawn or orphaned:
+            # we can't tell where their old geometry was drawn
+            clear_tile_cache()
+
+        self.stdout.write(self.style.SUCCESS('SUCCESS: Rebuilt shapes for %s precincts (%s already current, %s orphaned removed)' % (len(stale), len(current) - len(stale), len(orphaned))))
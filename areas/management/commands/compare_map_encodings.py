@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from areas.geojson import iter_feature_collection, precinct_topology
+from areas.models import PrecinctCode, PrecinctShape, WaPrecinct, DEFAULT_SHAPE_TOLERANCE
+import gzip
+import json
+import StringIO
+import time
+
+
+class Command(BaseCommand):
+    help = 'Measure GeoJSON vs TopoJSON payload size and parse time for a set of precincts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--district', type=int, default=None, help='Legislative district, e.g. 46')
+        parser.add_argument('--county', type=str, default=None, help='County name, e.g. King')
+        parser.add_argument('--repeat', type=int, default=5, help='Parses to average over')
+
+    def handle(self, *args, **options):
+        if options['district']:
+            precinct_ids = list(PrecinctCode.objects.filter(legislative_district=options['district']).values_list('precinct_id', flat=True))
+            label = 'LD %s' % options['district']
+        elif options['county']:
+            precinct_ids = list(WaPrecinct.objects.filter(county__iexact=options['county']).values_list('id', flat=True))
+            label = '%s County' % options['county']
+        else:
+            raise CommandError('Pass --district or --county.')
+
+        shapes = PrecinctShape.objects.lookup(precinct_ids, DEFAULT_SHAPE_TOLERANCE)
+        geojson = ''.join(iter_feature_collection(
+            '{"type": "Feature", "properties": {"id": %s}, "geometry": %s}' % (precinct_id, shape[0]) for precinct_id, shape in shapes.items()
+        ))
+
+        started = time.time()
+        topojson = json.dumps(precinct_topology(precinct_ids, dict((pk, {'id': pk}) for pk in precinct_ids)), separators=(',', ':'))
+        encode_time = time.time() - started
+
+        self.stdout.write('%s: %s precincts (TopoJSON built in %.2fs)' % (label, len(precinct_ids), encode_time))
+        self.stdout.write('%-9s %12s %12s %10s' % ('', 'bytes', 'gzipped', 'parse'))
+        for name, payload in (('GeoJSON', geojson), ('TopoJSON', topojson)):
+            self.stdout.write('%-9s %12s %12s %8.1fms' % (name, len(payload), len(self.gzip(payload)), self.parse_time(payload, options['repeat']) * 1000))
+
+    def gzip(self, payload):
+        buffer = StringIO.StringIO()
+        with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=6) as file:
+            file.write(payload)
+        return buffer.getvalue()
+
+    def parse_time(self, payload, repeat):
+        started = time.time()
+        for i in range(repeat):
+            json.loads(payload)
+        return (time.time() - started) / repeat
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from areas.dedup import DEFAULT_THRESHOLD, MAX_BLOCK_SIZE, DuplicateFinder, merge_clusters
+from areas.models import PrecinctCoordinator
+import time
+
+
+class Command(BaseCommand):
+    help = 'Find coordinators loaded more than once (by email, phone number or phonetic name within a precinct), and optionally merge them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Minimum pair score to count as a duplicate (default %s)' % DEFAULT_THRESHOLD)
+        parser.add_argument('--max-block-size', type=int, default=MAX_BLOCK_SIZE, help='Skip blocking keys shared by more rows than this')
+        parser.add_argument('--merge', action='store_true', default=False, help='Merge each group into its furthest-along coordinator')
+
+    def handle(self, *args, **options):
+        started = time.time()
+        finder = DuplicateFinder(threshold=options['threshold'], max_block_size=options['max_block_size']).load()
+        clusters = finder.clusters()
+
+        coordinators = PrecinctCoordinator.objects.select_related('precinct').defer('precinct__map_cache_geometry').in_bulk([pk for cluster in clusters for pk in cluster])
+        for cluster in clusters:
+            self.stdout.write('\nscore %.2f' % finder.cluster_score(cluster))
+            for pk in cluster:
+                coordinator = coordinators[pk]
+                self.stdout.write('  #%s  %s  <%s>  %s  [%s]' % (pk, coordinator.full_name, coordinator.email or '', coordinator.precinct.long_name, coordinator.status or '-'))
+
+        self.stdout.write('\n%s rows, %s blocks (%s too big to compare), %s pairs compared in %.1fs' % (
+            len(finder.records), len(finder.blocks), finder.skipped_blocks, finder.compared, time.time() - started))
+
+        if options['merge']:
+            merged = merge_clusters(clusters)
+            self.stdout.write(self.style.SUCCESS('SUCCESS: Merged %s duplicates into %s coordinators' % (merged, len(clusters))))
+        else:
+            self.stdout.write(self.style.SUCCESS('SUCCESS: Found %s groups of duplicates (run with --merge to merge them)' % len(clusters)))
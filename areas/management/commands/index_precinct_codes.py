@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from areas.models import WaPrecinct, PrecinctCode
+
+
+class Command(BaseCommand):
+    help = 'Parse every precinct name into the indexed PrecinctCode table.'
+
+    def handle(self, *args, **options):
+        codes = []
+        unparsed = 0
+        for precinct in WaPrecinct.objects.only('id', 'long_name').iterator():
+            code = PrecinctCode.for_precinct(precinct)
+            if code:
+                codes.append(code)
+            else:
+                unparsed += 1
+
+        with transaction.atomic():
+            PrecinctCode.objects.all().delete()
+            PrecinctCode.objects.bulk_create(codes, batch_size=2000)
+
+        self.stdout.write(self.style.SUCCESS('SUCCESS: Indexed %s precincts (%s names could not be parsed)' % (len(codes), unparsed)))
@@ -1,33 +1,179 @@
 from django.core.management.base import BaseCommand, CommandError
-from areas.models import WaPrecinct, Area, PrecinctCoordinator
+from django.db import transaction
+from areas.imports import ImportLedger, update_coordinators
+from areas.models import WaPrecinct, Area, AreaPrecinct, Affiliation, PhoneNumber, PrecinctCoordinator, AFFILIATIONS
+from areas.resolver import PrecinctResolver, line_coordinates, LATITUDE_FIELDS, LONGITUDE_FIELDS
+from collections import Counter
 import csv
+import time
 
 
 class Command(BaseCommand):
     help = 'Load in PCO coordinators.'
 
     def add_arguments(self, parser):
-        parser.add_argument('filename', type=str, help='A CSV filename, with fields: precinct, full_name, email, phone_number')
-        parser.add_argument('affiliation', nargs='?', type=str, default=None, choices=map(lambda a: a[0], PrecinctCoordinator.AFFILIATIONS))
+        parser.add_argument('filename', type=str, help='A CSV filename, with fields: precinct, full_name, email, phone_number (and optionally latitude, longitude for rows without a precinct)')
+        parser.add_argument('affiliation', nargs='?', type=str, default=None, choices=[a[0] for a in AFFILIATIONS if a[0]])
+        parser.add_argument('--bulk', action='store_true', default=False, help='Resolve precincts and existing coordinators in batches and insert with bulk_create')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per batch (and per transaction) in --bulk mode')
+        parser.add_argument('--dry-run', action='store_true', default=False, help='Report what --bulk would create without writing anything')
+        parser.add_argument('--source', type=str, default='load_coordinators', help='The import ledger that tracks this export\'s rows between runs')
+        parser.add_argument('--key-fields', type=str, default='email,full_name,precinct', help='Comma-separated columns that identify a row from one run to the next (with precinct, any latitude/longitude columns are added)')
+        parser.add_argument('--full', action='store_true', default=False, help='Ignore the import ledger and process every row')
 
     def handle(self, *args, **options):
-        created_count = not_created_count = 0
+        started = time.time()
         try:
             with open(options['filename'], 'rU') as file:
                 reader = csv.DictReader(file)
-                for line in reader:
-                    # look up precinct, and clean up data dict for entry
-                    precinct = WaPrecinct.objects.get(long_name=line['precinct'])
-                    line['precinct_id'] = precinct.pk
-                    del line['precinct']
-
-                    if not 'affiliation' in line:
-                        line['affiliation'] = options['affiliation']
-                    coordinator, created = PrecinctCoordinator.objects.get_or_create(**line)
-                    if created:
-                        created_count += 1
-                    else:
-                        not_created_count += 1
-            self.stdout.write(self.style.SUCCESS('SUCCESS: Created %s coordinators (did not create %s)' % (created_count, not_created_count)))
+                lines = list(reader)
+                fields = [f for f in reader.fieldnames if f not in ('precinct', 'affiliation') + LATITUDE_FIELDS + LONGITUDE_FIELDS]
         except IOError as e:
-            raise CommandError("Could not open CSV file '%s': \"%s\". Double-check that filename and path?" % (options['filename'], e))
\ No newline at end of file
+            raise CommandError("Could not open CSV file '%s': \"%s\". Double-check that filename and path?" % (options['filename'], e))
+
+        row_count = len(lines)
+        ledger = None
+        added, changed = [(line, None, None) for line in lines], []
+        if not options['full']:
+            # only rows that are new or changed since the last run go any further
+            key_fields = options['key_fields'].split(',')
+            if 'precinct' in key_fields:
+                # rows placed by location have no precinct yet; their coordinates stand in for it
+                key_fields += [f for f in reader.fieldnames if f in LATITUDE_FIELDS + LONGITUDE_FIELDS]
+            ledger = ImportLedger(options['source'], key_fields, reader.fieldnames)
+            added, changed = ledger.sort(lines)
+
+        lines = [line for line, key, content_hash in added]
+        self.place_by_coordinates(lines + [line for line, key, content_hash in changed])
+        if options['bulk'] or options['dry_run']:
+            created_count, not_created_count, coordinator_ids = self.load_bulk(lines, fields, options)
+        else:
+            created_count, not_created_count, coordinator_ids = self.load_rows(lines, fields, options)
+
+        if ledger and not options['dry_run']:
+            for (line, key, content_hash), coordinator_id in zip(added, coordinator_ids):
+                ledger.record(key, content_hash, coordinator_id)
+            updated_count = self.update_changed(changed, fields, ledger)
+            ledger.save()
+            self.stdout.write('Ledger: %s (%s coordinators updated)' % (ledger.summary(), updated_count))
+        elif ledger:
+            self.stdout.write('Ledger: %s' % ledger.summary())
+
+        elapsed = time.time() - started
+        self.stdout.write('Read %s rows in %.1fs (%.0f rows/sec)' % (row_count, elapsed, row_count / elapsed if elapsed else row_count))
+        self.stdout.write(self.style.SUCCESS('SUCCESS: %s %s coordinators (did not create %s)' % ('Would create' if options['dry_run'] else 'Created', created_count, not_created_count)))
+
+    def place_by_coordinates(self, lines):
+        """
+        Fills in the precinct of rows that only have a geocoded location.
+        """
+        located = [(line, line_coordinates(line)) for line in lines if not line.get('precinct')]
+        located = [(line, coordinates) for line, coordinates in located if coordinates]
+        if not located:
+            return
+
+        resolver = PrecinctResolver.shared()
+        for (line, coordinates), precinct_id in zip(located, resolver.resolve([c for l, c in located])):
+            if precinct_id:
+                line['precinct'] = resolver.names[precinct_id]
+        self.stdout.write('Placed %s of %s rows by location' % (sum(1 for line, c in located if line.get('precinct')), len(located)))
+
+    def load_rows(self, lines, fields, options):
+        created_count = not_created_count = 0
+        coordinator_ids = []
+        for line in lines:
+            # look up precinct, and clean up data dict for entry
+            data = dict((f, line[f]) for f in fields)
+            data['precinct_id'] = WaPrecinct.objects.only('pk').get(long_name=line['precinct']).pk
+
+            affiliation = line.get('affiliation') or options['affiliation']
+            coordinator, created = PrecinctCoordinator.objects.get_or_create(**data)
+            coordinator_ids.append(coordinator.pk)
+            if created:
+                if affiliation:
+                    coordinator.affiliations.add(Affiliation.objects.get(slug=affiliation))
+                created_count += 1
+            else:
+                not_created_count += 1
+        return created_count, not_created_count, coordinator_ids
+
+    def load_bulk(self, lines, fields, options):
+
+        # one query for every precinct in the file
+        names = set(line['precinct'] for line in lines)
+        precinct_ids = dict(WaPrecinct.objects.filter(long_name__in=names).values_list('long_name', 'id'))
+        unknown = names - set(precinct_ids)
+        if unknown:
+            raise CommandError('Unknown precincts: %s' % ', '.join(sorted(unknown)))
+
+        affiliation_ids = dict(Affiliation.objects.values_list('slug', 'id'))
+        Through = PrecinctCoordinator.affiliations.through
+
+        created_count = not_created_count = 0
+        coordinator_ids = []
+        seen = {}
+        batch_size = options['batch_size']
+        for start in range(0, len(lines), batch_size):
+            batch = lines[start:start + batch_size]
+            batch_precincts = set(precinct_ids[line['precinct']] for line in batch)
+
+            # same equality get_or_create(**line) would use, checked for the whole batch at once
+            existing = dict((row[1:], row[0]) for row in PrecinctCoordinator.objects.filter(precinct_id__in=batch_precincts).values_list('pk', 'precinct_id', *fields))
+            areas = AreaPrecinct.objects.area_ids(batch_precincts)
+
+            coordinators = []
+            affiliations = []
+            # each row's coordinator: a pk, or a new PrecinctCoordinator that gets one below
+            batch_coordinators = []
+            for line in batch:
+                precinct_id = precinct_ids[line['precinct']]
+                key = (precinct_id,) + tuple(line[f] for f in fields)
+                if key in existing or key in seen:
+                    not_created_count += 1
+                    batch_coordinators.append(existing.get(key) or seen[key])
+                    continue
+
+                data = dict((f, line[f]) for f in fields)
+                affiliation = line.get('affiliation') or options['affiliation']
+                # the through rows below bypass the m2m signal, so set the mask here
+                coordinator = seen[key] = PrecinctCoordinator(precinct_id=precinct_id, area_id=areas.get(precinct_id),
+                                                              affiliation_mask=Affiliation.mask_for([affiliation]), **data)
+                coordinators.append(coordinator)
+                batch_coordinators.append(coordinator)
+                affiliations.append(affiliation)
+
+            created_count += len(coordinators)
+            if not options['dry_run'] and coordinators:
+                with transaction.atomic():
+                    PrecinctCoordinator.objects.bulk_create(coordinators)
+                    PrecinctCoordinator.refresh_search_documents(coordinator_ids=[c.pk for c in coordinators])
+                    PhoneNumber.sync(coordinators)
+                    Through.objects.bulk_create([
+                        Through(precinctcoordinator_id=coordinator.pk, affiliation_id=affiliation_ids[affiliation])
+                        for coordinator, affiliation in zip(coordinators, affiliations) if affiliation in affiliation_ids
+                    ])
+                PrecinctCoordinator.bulk_written(batch_precincts, Counter((c.area_id, c.status) for c in coordinators))
+
+            coordinator_ids.extend(c.pk if isinstance(c, PrecinctCoordinator) else c for c in batch_coordinators)
+            self.stdout.write('%s/%s rows' % (min(start + batch_size, len(lines)), len(lines)))
+
+        return created_count, not_created_count, coordinator_ids
+
+    def update_changed(self, changed, fields, ledger):
+        """
+        Applies rows that changed since the last run to the coordinators they became.
+        """
+        names = set(line['precinct'] for line, key, content_hash in changed)
+        precinct_ids = dict(WaPrecinct.objects.filter(long_name__in=names).values_list('long_name', 'id'))
+
+        updates = []
+        for line, key, content_hash in changed:
+            if line['precinct'] not in precinct_ids:
+                # left out of the ledger, so it's tried again next run
+                self.stdout.write('Unknown precinct %s for %s' % (line['precinct'], line.get('full_name')))
+                continue
+            data = dict((f, line[f]) for f in fields)
+            data['precinct_id'] = precinct_ids[line['precinct']]
+            updates.append((ledger.coordinator_id(key), data))
+            ledger.record(key, content_hash, ledger.coordinator_id(key))
+        return update_coordinators(updates)
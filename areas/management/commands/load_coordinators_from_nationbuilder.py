@@ -1,8 +1,14 @@
 from django.core.management.base import BaseCommand, CommandError
+from areas.imports import ImportLedger, update_coordinators
 from areas.models import WaPrecinct, Area, PrecinctCoordinator
+from areas.nationbuilder import LEDGER_SOURCE, REVIEW_FIELDS, IndexedVoterMatcher, PrecinctFinder, VoterMatcher, coordinator_data, create_coordinator, describe_voter, ledger_fields
+from areas.resolver import PrecinctResolver, line_coordinates
+from areas.voterindex import VoterIndex
+from collections import OrderedDict
 import csv
 import os
 import records
+import time
 
 
 class Command(BaseCommand):
@@ -10,90 +16,124 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('filename', type=str, help='A CSV filename, with NationBuilder\'s fields [46th Dems flavor]')
-        # parser.add_argument('affiliation', nargs='?', type=str, default=None, choices=map(lambda a: a[0], PrecinctCoordinator.AFFILIATIONS))
+        parser.add_argument('--review-file', type=str, default=None, help='Where to write rows whose voter match is ambiguous (default: <filename>.review.csv)')
+        parser.add_argument('--batch-size', type=int, default=200, help='Names per voter database query')
+        parser.add_argument('--voter-index', type=str, default=None, help='Match against a build_voter_index file instead of the voter database')
+        parser.add_argument('--source', type=str, default=LEDGER_SOURCE, help='The import ledger that tracks this export\'s rows between runs')
+        parser.add_argument('--full', action='store_true', default=False, help='Ignore the import ledger and process every row')
 
     def handle(self, *args, **options):
         created_count = not_created_count = 0
+        timings = OrderedDict()
+        review_filename = options['review_file'] or '%s.review.csv' % os.path.splitext(options['filename'])[0]
 
-        VoterDB = records.Database(os.environ['VOTER_REGISTRATION_DATABASE'])
-
+        started = time.time()
         try:
             with open(options['filename'], 'rU') as file:
                 reader = csv.DictReader(file)
-                for line in reader:
-
-                    try:
-                        precinct = None
-
-                        if not line['precinct_code']:
-                            voters_lookup = VoterDB.query('SELECT * FROM wa_voter WHERE FName = :first_name AND LName = :last_name AND legislativedistrict = :legislative_district', first_name=line['first_name'].upper(), last_name=line['last_name'].upper(), legislative_district='46').all()
-                            if len(voters_lookup) > 0:
-
-                                index = None
-
-                                if len(voters_lookup) == 1 and \
-                                    voters_lookup[0]['regstnum'] in line['primary_address1'].upper() and \
-                                    voters_lookup[0]['regstname'] in line['primary_address1'].upper():
-                                    index = "1"
-
-                                else:
-                                    print ""
-                                    for i, voter in enumerate(voters_lookup):
-                                        print "%s: %s %s, %s %s %s %s, %s" % (i+1, voter['fname'], voter['lname'], voter['regstnum'], voter['regstpredirection'], voter['regstname'], voter['regstpostdirection'], voter['precinctcode'])
-                                    print ""
-                                    index = raw_input('Which voter matches %s at %s ? ' % (line['full_name'], line['primary_address1']))
-                                    print ""
-                                    if index == "":
-                                        index = "1"
-
-                                if index is None or index == "skip":
-                                    continue
-                                    
-                                precinct = WaPrecinct.objects.get(long_name__contains="46-%s" % str(voters_lookup[int(index)-1]['precinctcode']).zfill(4))
-
-                        elif len(line['precinct_code']) == 4:
-                            precinct = WaPrecinct.objects.get(short_name=line['precinct_code'], long_name__contains="46-%s" % str(line['precinct_code']).zfill(4))
-
-                        elif len(line['precinct_code']) >= 7:
-                            precinct = WaPrecinct.objects.get(long_name__contains=line['precinct_code'])
-
-                        data = {
-                            'full_name': line['full_name'],
-                            'email': line['email1'],
-                            'phone_number': line['phone_number'],
-                            'affiliation': 'delegate',
-                        }
-
-                        if "clinton" in line['tag_list'].lower():
-                            notes = "Clinton"
-                        elif "sanders" in line['tag_list'].lower():
-                            notes = "Sanders"
-                        else:
-                            notes = "Precinct"
-                        
-                        notes += " Delegate"
-                        
-                        if "statedel" in line['tag_list'].lower():
-                            notes += ", State Delegate"
-                        elif "statealt" in line['tag_list'].lower():
-                            notes += ", State Alternate"
-
-                        data['notes'] = notes
-
-                        if precinct:
-                            data['precinct_id'] = precinct.id
-
-
-                        coordinator, created = PrecinctCoordinator.objects.get_or_create(**data)
-                        if created:
-                            created_count += 1
-                        else:
-                            not_created_count += 1
-
-                    except BaseException, e:
-                        print "Barfed on %s, %s: %s" % (line['full_name'], line['primary_address1'], e.message)
-
-
-            self.stdout.write(self.style.SUCCESS('SUCCESS: Created %s coordinators (did not create %s)' % (created_count, not_created_count)))
+                fieldnames = reader.fieldnames
+                lines = list(reader)
         except IOError as e:
-            raise CommandError("Could not open CSV file '%s': \"%s\". Double-check that filename and path?" % (options['filename'], e))
\ No newline at end of file
+            raise CommandError("Could not open CSV file '%s': \"%s\". Double-check that filename and path?" % (options['filename'], e))
+        timings['read'] = time.time() - started
+
+        # only rows that are new or changed since the last run go any further
+        started = time.time()
+        ledger = None
+        ledger_rows = {}
+        if not options['full']:
+            ledger = ImportLedger(options['source'], *ledger_fields(fieldnames))
+            added, changed = ledger.sort(lines)
+            ledger_rows = dict((id(line), (key, content_hash, False)) for line, key, content_hash in added)
+            ledger_rows.update((id(line), (key, content_hash, True)) for line, key, content_hash in changed)
+            lines = [line for line, key, content_hash in added + changed]
+        timings['ledger'] = time.time() - started
+
+        # geocoded rows without a precinct code get placed by point-in-polygon
+        started = time.time()
+        located = {}
+        coordinates = [(i, line_coordinates(line)) for i, line in enumerate(lines) if not line['precinct_code']]
+        coordinates = [(i, c) for i, c in coordinates if c]
+        if coordinates:
+            resolved = PrecinctResolver.shared().resolve([c for i, c in coordinates])
+            located = dict((i, precinct_id) for (i, c), precinct_id in zip(coordinates, resolved) if precinct_id)
+        timings['locate'] = time.time() - started
+
+        # look up everyone else without a precinct code in a handful of queries
+        started = time.time()
+        unplaced = [line for i, line in enumerate(lines) if not line['precinct_code'] and i not in located]
+        voters = {}
+        if unplaced:
+            if options['voter_index']:
+                matcher = IndexedVoterMatcher(VoterIndex.load(options['voter_index']))
+            else:
+                matcher = VoterMatcher(records.Database(os.environ['VOTER_REGISTRATION_DATABASE']), batch_size=options['batch_size'])
+            voters = matcher.lookup(unplaced)
+        timings['voter lookup'] = time.time() - started
+
+        started = time.time()
+        finder = PrecinctFinder()
+        placed = []
+        review = []
+        for i, line in enumerate(lines):
+            try:
+                if line['precinct_code']:
+                    precinct_id = finder.by_code(line['precinct_code'])
+                elif i in located:
+                    precinct_id = located[i]
+                else:
+                    voter, candidates = matcher.resolve(line, voters[matcher.key(line)])
+                    if candidates:
+                        review.append(dict(line, **{
+                            'candidates': '; '.join('%s: %s' % (i + 1, describe_voter(v)) for i, v in enumerate(candidates)),
+                            'candidate_precinct_codes': ';'.join(str(v['precinctcode']) for v in candidates),
+                            'choice': '',
+                        }))
+                        continue
+                    precinct_id = finder.by_voter_code(voter['precinctcode']) if voter else None
+
+                if precinct_id:
+                    placed.append((line, precinct_id))
+                else:
+                    self.stdout.write("No precinct for %s, %s" % (line['full_name'], line['primary_address1']))
+
+            except Exception as e:
+                self.stdout.write("Barfed on %s, %s: %s" % (line['full_name'], line['primary_address1'], e))
+        timings['match'] = time.time() - started
+
+        started = time.time()
+        updates = []
+        for line, precinct_id in placed:
+            key, content_hash, is_changed = ledger_rows.get(id(line), (None, None, False))
+            if is_changed:
+                updates.append((ledger.coordinator_id(key), dict(coordinator_data(line), precinct_id=precinct_id)))
+                ledger.record(key, content_hash, ledger.coordinator_id(key))
+                continue
+            try:
+                coordinator, created = create_coordinator(coordinator_data(line), precinct_id)
+                if ledger:
+                    ledger.record(key, content_hash, coordinator.pk)
+                if created:
+                    created_count += 1
+                else:
+                    not_created_count += 1
+            except Exception as e:
+                self.stdout.write("Barfed on %s, %s: %s" % (line['full_name'], line['primary_address1'], e))
+        updated_count = update_coordinators(updates)
+        if ledger:
+            ledger.save()
+        timings['save'] = time.time() - started
+
+        if review:
+            with open(review_filename, 'w') as file:
+                writer = csv.DictWriter(file, fieldnames=list(fieldnames) + REVIEW_FIELDS)
+                writer.writeheader()
+                writer.writerows(review)
+            self.stdout.write('%s ambiguous rows written to %s; fill in "choice" and run apply_coordinator_review.' % (len(review), review_filename))
+
+        for stage, seconds in timings.items():
+            self.stdout.write('%-14s %.2fs' % (stage, seconds))
+
+        if ledger:
+            self.stdout.write('Ledger: %s (%s coordinators updated)' % (ledger.summary(), updated_count))
+        self.stdout.write(self.style.SUCCESS('SUCCESS: Created %s coordinators (did not create %s)' % (created_count, not_created_count)))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from areas.models import PrecinctCoordinator, PrecinctStatus
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-precinct coordinator status rollup from scratch.'
+
+    def handle(self, *args, **options):
+        rollups = PrecinctStatus.compute(PrecinctCoordinator.objects.all())
+        with transaction.atomic():
+            PrecinctStatus.objects.all().delete()
+            PrecinctStatus.objects.bulk_create(rollups, batch_size=2000)
+
+        self.stdout.write(self.style.SUCCESS('SUCCESS: Rebuilt status for %s precincts (%s with a walker)' % (len(rollups), sum(1 for r in rollups if r.has_walker))))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from areas.models import AreaStatusCount
+
+
+class Command(BaseCommand):
+    help = 'Recount the area x status dashboard counters from the coordinators table.'
+
+    def handle(self, *args, **options):
+        AreaStatusCount.rebuild()
+        self.stdout.write(self.style.SUCCESS('SUCCESS: Rebuilt %s area/status counters' % AreaStatusCount.objects.count()))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from areas.models import Area, AreaMap, AreaPrecinct
+
+
+class Command(BaseCommand):
+    help = 'Rebuild every area\'s stored outline and precinct shapes (run after cache_precinct_shapes).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--memberships', action='store_true', default=False,
+                            help='First reset which precincts are in which area to Area.AREA_MAPS, undoing changes made in the admin')
+
+    def handle(self, *args, **options):
+        if options['memberships']:
+            self.stdout.write('%s precincts changed areas' % AreaPrecinct.rebuild())
+        area_ids = list(Area.objects.values_list('id', flat=True))
+        AreaMap.refresh(area_ids)
+        self.stdout.write(self.style.SUCCESS('SUCCESS: Refreshed maps for %s areas' % len(area_ids)))
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2016-10-18 06:40
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('areas', '0006_auto_20161015_1718'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecinctShape',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tolerance', models.FloatField()),
+                ('geojson', models.TextField()),
+                ('centroid_x', models.FloatField()),
+                ('centroid_y', models.FloatField()),
+                ('geometry_hash', models.CharField(help_text='md5 of the source geometry, used to spot stale shapes', max_length=32)),
+                ('precinct', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shapes', to='areas.WaPrecinct')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='precinctshape',
+            unique_together=set([('precinct', 'tolerance')]),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2016-10-18 07:02
+from __future__ import unicode_literals
+
+from areas.models import Area as AreaModel
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_memberships(apps, schema_editor):
+    Area = apps.get_model('areas', 'Area')
+    AreaPrecinct = apps.get_model('areas', 'AreaPrecinct')
+    WaPrecinct = apps.get_model('areas', 'WaPrecinct')
+
+    # a precinct listed twice (or in two areas) keeps its first area
+    memberships = {}
+    for area in Area.objects.filter(name__in=AreaModel.AREA_MAPS.keys()):
+        precincts = WaPrecinct.objects.filter(long_name__in=AreaModel.AREA_MAPS[area.name]['precincts']).values_list('id', flat=True)
+        for precinct_id in precincts:
+            memberships.setdefault(precinct_id, area.id)
+
+    AreaPrecinct.objects.bulk_create([AreaPrecinct(precinct_id=precinct_id, area_id=area_id) for precinct_id, area_id in memberships.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('areas', '0007_precinctshape'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AreaPrecinct',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='areas.Area')),
+                ('precinct', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='area_membership', to='areas.WaPrecinct')),
+            ],
+            options={
+                'verbose_name': 'Area Precinct',
+            },
+        ),
+        migrations.RunPython(populate_memberships, reverse_code=migrations.RunPython.noop),
+    ]
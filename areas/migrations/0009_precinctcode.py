@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2016-10-18 07:31
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import re
+
+
+# as areas.models.PRECINCT_NAME_RE was when this migration was written
+PRECINCT_NAME_RE = re.compile(r'^\s*(?:(?P<jurisdiction>[A-Za-z]+)\s+)?(?P<legislative_district>\d{1,2})-(?P<code>\d{1,4})\s*$')
+
+
+def index_precinct_codes(apps, schema_editor):
+    PrecinctCode = apps.get_model('areas', 'PrecinctCode')
+    WaPrecinct = apps.get_model('areas', 'WaPrecinct')
+
+    codes = []
+    for precinct_id, long_name in WaPrecinct.objects.values_list('id', 'long_name').iterator():
+        match = PRECINCT_NAME_RE.match(long_name or '')
+        if match and match.group('jurisdiction'):
+            codes.append(PrecinctCode(precinct_id=precinct_id, jurisdiction=match.group('jurisdiction').upper(),
+                                      legislative_district=int(match.group('legislative_district')), code=match.group('code').zfill(4)))
+    PrecinctCode.objects.bulk_create(codes, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('areas', '0008_areaprecinct'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecinctCode',
+            fields=[
+                ('precinct', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='code', serialize=False, to='areas.WaPrecinct')),
+                ('jurisdiction', models.CharField(max_length=8)),
+                ('legislative_district', models.PositiveSmallIntegerField()),
+                ('code', models.CharField(max_length=4)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='precinctcode',
+            index_together=set([('legislative_district', 'code'), ('jurisdiction', 'legislative_district', 'code')]),
+        ),
+        migrations.RunPython(index_precinct_codes, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2016-10-18 07:48
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# as areas.models had them when this migration was written
+STATUS_PROGRESS = ['will-not-walk', None, 'email', 'voicemail', 'will-walk', 'picked-up-packet', 'walked', 'data-entered']
+WALKER_STATUSES = ['will-walk', 'picked-up-packet', 'walked', 'data-entered']
+
+
+def build_rollups(apps, schema_editor):
+    AreaPrecinct = apps.get_model('areas', 'AreaPrecinct')
+    PrecinctCoordinator = apps.get_model('areas', 'PrecinctCoordinator')
+    PrecinctStatus = apps.get_model('areas', 'PrecinctStatus')
+
+    rank = models.Case(*[models.When(status=status, then=models.Value(i)) for i, status in enumerate(STATUS_PROGRESS) if status],
+                       default=models.Value(STATUS_PROGRESS.index(None)), output_field=models.IntegerField())
+    walker = models.Case(models.When(status__in=WALKER_STATUSES, then=models.Value(1)), default=models.Value(0), output_field=models.IntegerField())
+    rows = PrecinctCoordinator.objects.order_by().values('precinct_id').annotate(
+        best_rank=models.Max(rank), walkers=models.Max(walker), count=models.Count('id'), area_id=models.Max('area_id'))
+    areas = dict(AreaPrecinct.objects.values_list('precinct_id', 'area_id'))
+
+    PrecinctStatus.objects.bulk_create([
+        PrecinctStatus(precinct_id=row['precinct_id'], area_id=areas.get(row['precinct_id'], row['area_id']),
+                       best_status=STATUS_PROGRESS[row['best_rank']], coordinator_count=row['count'], has_walker=bool(row['walkers']))
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('areas', '0009_precinctcode'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='precinctcoordinator',
+            name='status',
+            field=models.CharField(blank=True, choices=[(None, '-'), ('email', 'Email'), ('voicemail', 'Voicemail'), ('will-walk', 'Will Walk'), ('picked-up-packet', 'Has Packet'), ('walked', 'Walked'), ('data-entered', 'Data Entered'), ('will-not-walk', 'Will Not Walk')], db_index=True, default=None, max_length=32, null=True),
+        ),
+        migrations.CreateModel(
+            name='PrecinctStatus',
+            fields=[
+                ('precinct', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='status_rollup', serialize=False, to='areas.WaPrecinct')),
+                ('best_status', models.CharField(blank=True, choices=[(None, '-'), ('email', 'Email'), ('voicemail', 'Voicemail'), ('will-walk', 'Will Walk'), ('picked-up-packet', 'Has Packet'), ('walked', 'Walked'), ('data-entered', 'Data Entered'), ('will-not-walk', 'Will Not Walk')], default=None, max_length=32, null=True)),
+                ('coordinator_count', models.PositiveIntegerField(default=0)),
+                ('has_walker', models.BooleanField(db_index=True, default=False)),
+                ('area', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='areas.Area')),
+            ],
+            options={
+                'verbose_name_plural': 'Precinct Statuses',
+            },
+        ),
+        migrations.RunPython(build_rollups, reverse_code=migrations.RunPython.noop),
+    ]
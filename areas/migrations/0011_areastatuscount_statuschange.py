@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2016-10-18 08:05
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+STATUS_CHOICES = [(None, '-'), ('email', 'Email'), ('voicemail', 'Voicemail'), ('will-walk', 'Will Walk'), ('picked-up-packet', 'Has Packet'), ('walked', 'Walked'), ('data-entered', 'Data Entered'), ('will-not-walk', 'Will Not Walk')]
+
+
+def count_statuses(apps, schema_editor):
+    AreaStatusCount = apps.get_model('areas', 'AreaStatusCount')
+    PrecinctCoordinator = apps.get_model('areas', 'PrecinctCoordinator')
+
+    counts = PrecinctCoordinator.objects.order_by().values('area_id', 'status').annotate(count=models.Count('id'))
+    AreaStatusCount.objects.bulk_create([AreaStatusCount(area_id=row['area_id'], status=row['status'], count=row['count']) for row in counts])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('areas', '0010_precinctstatus'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AreaStatusCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(blank=True, choices=STATUS_CHOICES, default=None, max_length=32, null=True)),
+                ('count', models.IntegerField(default=0)),
+                ('area', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='areas.Area')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='areastatuscount',
+            unique_together=set([('area', 'status')]),
+        ),
+        migrations.CreateModel(
+            name='StatusChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_status', models.CharField(blank=True, choices=STATUS_CHOICES, default=None, max_length=32, null=True)),
+                ('new_status', models.CharField(blank=True, choices=STATUS_CHOICES, default=None, max_length=32, null=True)),
+                ('changed_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('area', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='areas.Area')),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('coordinator', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='status_changes', to='areas.PrecinctCoordinator')),
+            ],
+            options={
+                'ordering': ('-changed_at',),
+            },
+        ),
+        migrations.RunPython(count_statuses, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2016-10-18 08:52
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('areas', '0012_areamap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='areamap',
+            name='topology',
+            field=models.TextField(blank=True, help_text='The member precincts as TopoJSON'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2016-10-18 09:10
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    wa_precincts isn't managed by Django, but the map's viewport queries depend on
+    its geometry having a spatial index, so make sure there is one.
+    """
+
+    dependencies = [
+        ('areas', '0013_areamap_topology'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS wa_precincts_map_cache_geometry_gist ON wa_precincts USING GIST (map_cache_geometry)',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2016-10-18 10:02
+from __future__ import unicode_literals
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def build_masks(apps, schema_editor):
+    Affiliation = apps.get_model('areas', 'Affiliation')
+    PrecinctCoordinator = apps.get_model('areas', 'PrecinctCoordinator')
+
+    for bit, affiliation in enumerate(Affiliation.objects.order_by('pk')):
+        affiliation.bit = bit
+        affiliation.save(update_fields=['bit'])
+
+    masks = defaultdict(int)
+    for coordinator_id, bit in PrecinctCoordinator.affiliations.through.objects.values_list('precinctcoordinator_id', 'affiliation__bit'):
+        masks[coordinator_id] |= 1 << bit
+
+    by_mask = defaultdict(list)
+    for coordinator_id, mask in masks.items():
+        by_mask[mask].append(coordinator_id)
+    for mask, ids in by_mask.items():
+        PrecinctCoordinator.objects.filter(pk__in=ids).update(affiliation_mask=mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('areas', '0014_wa_precincts_geometry_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='affiliation',
+            name='bit',
+            field=models.PositiveSmallIntegerField(editable=False, help_text='Its flag in PrecinctCoordinator.affiliation_mask', null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='precinctcoordinator',
+            name='affiliation_mask',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(build_masks, reverse_code=migrations.RunPython.noop),
+    ]
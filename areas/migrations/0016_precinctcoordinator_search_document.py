@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2016-10-18 10:41
+from __future__ import unicode_literals
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+# as areas.models.SEARCH_DOCUMENT_SQL was when this migration was written
+SEARCH_DOCUMENT_SQL = """
+    UPDATE areas_precinctcoordinator AS coordinator
+       SET search_document = lower(concat_ws(' ', coordinator.full_name, coordinator.email, coordinator.phone_number,
+                                             regexp_replace(coalesce(coordinator.phone_number, ''), '[^0-9\\n]+', '', 'g'),
+                                             precinct.long_name))
+      FROM wa_precincts AS precinct
+     WHERE precinct.id = coordinator.precinct_id
+"""
+
+
+def build_search_documents(apps, schema_editor):
+    schema_editor.execute(SEARCH_DOCUMENT_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('areas', '0015_affiliation_mask'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='precinctcoordinator',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(build_search_documents, reverse_code=migrations.RunPython.noop),
+        migrations.RunSQL(
+            'CREATE INDEX areas_precinctcoordinator_search_document_trgm ON areas_precinctcoordinator USING GIN (search_document gin_trgm_ops)',
+            reverse_sql='DROP INDEX areas_precinctcoordinator_search_document_trgm',
+        ),
+    ]
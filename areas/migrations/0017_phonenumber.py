@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2016-10-18 11:15
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import re
+
+
+# areas.phones' parser as it was when this migration was written
+LABELS = {
+    'c': 'cell', 'cell': 'cell', 'm': 'cell', 'mobile': 'cell',
+    'h': 'home', 'home': 'home',
+    'w': 'work', 'work': 'work', 'o': 'work', 'office': 'work',
+    'fax': 'fax',
+}
+
+SEPARATOR_RE = re.compile(r'[\n,;]+|/(?!\s*\d{3}[-.\s]?\d{4}\b)|\s+or\s+', re.I)
+EXTENSION_RE = re.compile(r'\s*(?:x|ext\.?|extension)\s*\d+\s*$', re.I)
+WORD_RE = re.compile(r'[a-z]+')
+
+
+def normalize_phone_number(text):
+    text = EXTENSION_RE.sub('', text or '').strip()
+    digits = re.sub(r'\D', '', text)
+    if text.startswith('+'):
+        return '+' + digits if 8 <= len(digits) <= 15 else None
+    if len(digits) == 10:
+        return '+1' + digits
+    if len(digits) == 11 and digits.startswith('1'):
+        return '+' + digits
+    return None
+
+
+def phone_label(text):
+    for word in WORD_RE.findall(EXTENSION_RE.sub('', text).lower()):
+        if word in LABELS:
+            return LABELS[word]
+    return ''
+
+
+def parse_phone_numbers(text):
+    numbers = []
+    for part in SEPARATOR_RE.split(text or ''):
+        number = normalize_phone_number(part)
+        if number and number not in [n for n, label in numbers]:
+            numbers.append((number, phone_label(part)))
+    return numbers
+
+
+def parse_existing_numbers(apps, schema_editor):
+    PhoneNumber = apps.get_model('areas', 'PhoneNumber')
+    PrecinctCoordinator = apps.get_model('areas', 'PrecinctCoordinator')
+
+    PhoneNumber.objects.bulk_create([
+        PhoneNumber(coordinator_id=coordinator_id, number=number, label=label, position=position)
+        for coordinator_id, phone_number in PrecinctCoordinator.objects.exclude(phone_number=None).values_list('id', 'phone_number').iterator()
+        for position, (number, label) in enumerate(parse_phone_numbers(phone_number))
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('areas', '0016_precinctcoordinator_search_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhoneNumber',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.CharField(db_index=True, help_text='E.164, e.g. +12065550100', max_length=16)),
+                ('label', models.CharField(blank=True, help_text='cell, home, work or fax, when noted', max_length=16)),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('coordinator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='phone_numbers', to='areas.PrecinctCoordinator')),
+            ],
+            options={
+                'ordering': ('coordinator', 'position'),
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='phonenumber',
+            unique_together=set([('coordinator', 'number')]),
+        ),
+        migrations.RunPython(parse_existing_numbers, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2016-10-18 11:52
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('areas', '0017_phonenumber'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRecord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=64)),
+                ('source_key', models.CharField(max_length=255)),
+                ('content_hash', models.CharField(max_length=40)),
+                ('imported_at', models.DateTimeField(auto_now=True)),
+                ('removed_at', models.DateTimeField(blank=True, help_text='When the row was first missing from its export', null=True)),
+                ('coordinator', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_records', to='areas.PrecinctCoordinator')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='importrecord',
+            unique_together=set([('source', 'source_key')]),
+        ),
+    ]
@@ -1,13 +1,31 @@
 from __future__ import unicode_literals
 
+from collections import Counter, defaultdict, namedtuple
+import json
+import re
+import time
+
 from django.contrib.gis.db import models
+from django.contrib.gis.geos import MultiPolygon
 from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
+from django.db.models.signals import m2m_changed, post_delete, pre_delete
+from django.dispatch import receiver
 from django.template.defaultfilters import slugify
 
 from django import forms
 
 from localflavor.us.models import PhoneNumberField
 
+from .phones import format_phone_number, normalize_phone_number, parse_phone_numbers
+
+
+# simplification tolerances (in degrees) that PrecinctShape caches per precinct
+SHAPE_TOLERANCES = (0.0001, 0.0005, 0.001)
+DEFAULT_SHAPE_TOLERANCE = 0.0001
+
+Centroid = namedtuple('Centroid', ['x', 'y'])
+
 
 class WaPrecinct(models.Model):
     short_name = models.CharField(max_length=12, blank=True, null=True)
@@ -26,11 +44,174 @@ class WaPrecinct(models.Model):
     def __unicode__(self):
         return self.long_name
 
-    def jsonify(self):
-        return self.map_cache_geometry.transform(4326, clone=True).simplify(0.0001).json
+    def save(self, *args, **kwargs):
+        from .tiles import invalidate_precinct_tiles
+        if self.pk:
+            # the tiles under the old geometry; shapes_changed takes care of the new
+            invalidate_precinct_tiles([self.pk])
+        super(WaPrecinct, self).save(*args, **kwargs)
+        # the geometry may have changed; drop the cached shapes until they get rebuilt.
+        self.shapes.all().delete()
+        WaPrecinct.shapes_changed([self.pk])
+        from .resolver import PrecinctResolver
+        PrecinctResolver.reset()
+
+        PrecinctCode.objects.filter(precinct_id=self.pk).delete()
+        code = PrecinctCode.for_precinct(self)
+        if code:
+            code.save()
+
+        PrecinctCoordinator.refresh_search_documents(precinct_ids=[self.pk])
+
+    @classmethod
+    def shapes_changed(cls, precinct_ids):
+        """
+        Refreshes what's drawn from these precincts' geometry or PrecinctShapes:
+        map payloads, the stored maps of areas showing them, and their tiles.
+        """
+        precinct_ids = [pk for pk in set(precinct_ids) if pk]
+        if not precinct_ids:
+            return
+        bump_cache_version(PRECINCT_SHAPE_VERSION_KEY)
+
+        area_ids = set(AreaPrecinct.objects.area_ids(precinct_ids).values())
+        area_ids.update(PrecinctCoordinator.objects.filter(precinct_id__in=precinct_ids).values_list('area_id', flat=True))
+        AreaMap.refresh(area_ids)
+
+        from .tiles import invalidate_precinct_tiles
+        invalidate_precinct_tiles(precinct_ids)
+
+    def cached_shape(self, tolerance=DEFAULT_SHAPE_TOLERANCE):
+        # iterate .all() rather than filter() so a prefetch_related('shapes') gets used.
+        for shape in self.shapes.all():
+            if shape.tolerance == tolerance:
+                return shape
+        return None
+
+    def simplified_geometry(self, tolerance=DEFAULT_SHAPE_TOLERANCE):
+        return self.map_cache_geometry.transform(4326, clone=True).simplify(tolerance)
+
+    def jsonify(self, tolerance=DEFAULT_SHAPE_TOLERANCE):
+        shape = self.cached_shape(tolerance)
+        if shape:
+            return shape.geojson
+        return self.simplified_geometry(tolerance).json
 
     def centroid(self):
-        return self.map_cache_geometry.centroid.transform(4326, clone=True)
+        shape = self.cached_shape()
+        if shape:
+            return Centroid(shape.centroid_x, shape.centroid_y)
+        point = self.map_cache_geometry.centroid.transform(4326, clone=True)
+        return Centroid(point.x, point.y)
+
+
+PRECINCT_NAME_RE = re.compile(r'^\s*(?:(?P<jurisdiction>[A-Za-z]+)\s+)?(?P<legislative_district>\d{1,2})-(?P<code>\d{1,4})\s*$')
+
+
+def parse_precinct_name(value, legislative_district=None):
+    """
+    Splits any of the ways the importers name a precinct -- 'SEA 46-1234', '46-1234',
+    a bare '1234' or a voter file's 1234 -- into PrecinctCode lookup fields.
+    A bare code needs the legislative_district it belongs to.
+    """
+    value = str(value).strip()
+    match = PRECINCT_NAME_RE.match(value)
+    if match:
+        fields = {'legislative_district': int(match.group('legislative_district')), 'code': match.group('code').zfill(4)}
+        if match.group('jurisdiction'):
+            fields['jurisdiction'] = match.group('jurisdiction').upper()
+        return fields
+    if value.isdigit() and len(value) <= 4 and legislative_district:
+        return {'legislative_district': int(legislative_district), 'code': value.zfill(4)}
+    return None
+
+
+class PrecinctCodeQuerySet(models.QuerySet):
+
+    def precinct_id(self, value, legislative_district=None):
+        """
+        The id of the precinct value names (see parse_precinct_name); raises
+        WaPrecinct.DoesNotExist or MultipleObjectsReturned like get() would.
+        """
+        fields = parse_precinct_name(value, legislative_district)
+        if not fields:
+            raise WaPrecinct.DoesNotExist("Can't parse precinct %r" % value)
+        ids = list(self.filter(**fields).values_list('precinct_id', flat=True)[:2])
+        if not ids:
+            raise WaPrecinct.DoesNotExist('No precinct %r' % value)
+        if len(ids) > 1:
+            raise WaPrecinct.MultipleObjectsReturned('More than one precinct matches %r' % value)
+        return ids[0]
+
+
+class PrecinctCode(models.Model):
+    """
+    wa_precincts.long_name parsed into indexed parts, so the importers can find a
+    precinct by code without LIKE scans. Filled in by index_precinct_codes.
+    """
+    precinct = models.OneToOneField(WaPrecinct, primary_key=True, related_name='code')
+    jurisdiction = models.CharField(max_length=8)
+    legislative_district = models.PositiveSmallIntegerField()
+    code = models.CharField(max_length=4)
+
+    objects = PrecinctCodeQuerySet.as_manager()
+
+    class Meta:
+        index_together = [
+            ('legislative_district', 'code'),
+            ('jurisdiction', 'legislative_district', 'code'),
+        ]
+
+    def __unicode__(self):
+        return '%s %s-%s' % (self.jurisdiction, self.legislative_district, self.code)
+
+    @classmethod
+    def for_precinct(cls, precinct):
+        fields = parse_precinct_name(precinct.long_name)
+        if not fields or 'jurisdiction' not in fields:
+            return None
+        return cls(precinct_id=precinct.pk, **fields)
+
+
+class PrecinctShapeQuerySet(models.QuerySet):
+
+    def lookup(self, precinct_ids, tolerance=DEFAULT_SHAPE_TOLERANCE):
+        """
+        Returns {precinct_id: (geojson, centroid_x, centroid_y)} for the given precincts,
+        computing (but not storing) any shape that hasn't been cached yet.
+        """
+        shapes = {
+            precinct_id: (geojson, x, y) for precinct_id, geojson, x, y in
+            self.filter(precinct_id__in=precinct_ids, tolerance=tolerance).values_list('precinct_id', 'geojson', 'centroid_x', 'centroid_y')
+        }
+        missing = set(precinct_ids) - set(shapes)
+        if missing:
+            for precinct in WaPrecinct.objects.filter(pk__in=missing).exclude(map_cache_geometry=None).iterator():
+                geometry = precinct.map_cache_geometry.transform(4326, clone=True)
+                centroid = geometry.centroid
+                shapes[precinct.pk] = (geometry.simplify(tolerance).json, centroid.x, centroid.y)
+        return shapes
+
+
+class PrecinctShape(models.Model):
+    """
+    Simplified GeoJSON and centroid for a precinct at one of SHAPE_TOLERANCES,
+    filled in by the cache_precinct_shapes command so map pages don't touch GEOS.
+    """
+    precinct = models.ForeignKey(WaPrecinct, related_name='shapes')
+    tolerance = models.FloatField()
+    geojson = models.TextField()
+    centroid_x = models.FloatField()
+    centroid_y = models.FloatField()
+    geometry_hash = models.CharField(max_length=32, help_text='md5 of the source geometry, used to spot stale shapes')
+
+    objects = PrecinctShapeQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('precinct', 'tolerance')
+
+    def __unicode__(self):
+        return '%s @ %s' % (self.precinct_id, self.tolerance)
 
 
 class Area(models.Model):
@@ -88,7 +269,15 @@ class Area(models.Model):
     def save(self, *args, **kwargs):
         if not self.color and self.name and self.name in self.AREA_MAPS:
             self.color = self.AREA_MAPS[self.name]['color']
-        return super(Area, self).save(*args, **kwargs)
+
+        color_changed = self.pk and Area.objects.filter(pk=self.pk).exclude(color=self.color).exists()
+        result = super(Area, self).save(*args, **kwargs)
+        if color_changed:
+            # every tile carrying this area's color is stale.
+            from .tiles import clear_tile_cache
+            clear_tile_cache()
+        coordinators_changed()
+        return result
 
     def __unicode__(self):
         return self.name
@@ -97,18 +286,302 @@ class Area(models.Model):
         verbose_name = 'Precinct Area'
 
 
+class AreaMap(models.Model):
+    """
+    An area's dissolved outline and its member precincts' simplified shapes, stored
+    as a ready-to-draw FeatureCollection for AreaAdmin.change_view.
+    """
+    area = models.OneToOneField(Area, primary_key=True, related_name='map')
+    outline = models.MultiPolygonField(null=True, blank=True, srid=4326)
+    payload = models.TextField(blank=True)
+    topology = models.TextField(blank=True, help_text='The member precincts as TopoJSON')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __unicode__(self):
+        return 'Map of %s' % self.area_id
+
+    @classmethod
+    def refresh(cls, area_ids):
+        for area_id in set(area_ids):
+            if area_id:
+                cls.build(area_id).save()
+
+    @classmethod
+    def coordinator_moved(cls, placements):
+        """
+        A coordinator arrived in or left each (area_id, precinct_id); only a precinct
+        outside the area's membership changes what the area's map draws.
+        """
+        cls.refresh(area_id for area_id, precinct_id in placements if area_id and AreaPrecinct.area_id_for(precinct_id) != area_id)
+
+    @classmethod
+    def build(cls, area_id):
+        # members, plus any precinct a coordinator was put in by hand
+        precinct_ids = set(AreaPrecinct.objects.filter(area_id=area_id).values_list('precinct_id', flat=True))
+        precinct_ids.update(PrecinctCoordinator.objects.filter(area_id=area_id).values_list('precinct_id', flat=True))
+
+        outline = WaPrecinct.objects.filter(pk__in=precinct_ids).aggregate(outline=models.Union('map_cache_geometry'))['outline'] if precinct_ids else None
+        if outline is not None and outline.geom_type == 'Polygon':
+            outline = MultiPolygon(outline, srid=outline.srid)
+
+        features = []
+        if outline is not None:
+            features.append('{"type": "Feature", "properties": {"kind": "outline"}, "geometry": %s}' % outline.simplify(DEFAULT_SHAPE_TOLERANCE).json)
+
+        names = dict(WaPrecinct.objects.filter(pk__in=precinct_ids).values_list('id', 'long_name'))
+        properties = {}
+        for precinct_id, (geojson, centroid_x, centroid_y) in sorted(PrecinctShape.objects.lookup(precinct_ids).items()):
+            properties[precinct_id] = {'kind': 'precinct', 'id': precinct_id, 'name': names.get(precinct_id), 'centroid': [centroid_x, centroid_y]}
+            features.append('{"type": "Feature", "properties": %s, "geometry": %s}' % (json.dumps(properties[precinct_id]), geojson))
+
+        # the TopoJSON version leaves the outline to the browser (topojson.merge)
+        from .geojson import precinct_topology
+        topology = precinct_topology(precinct_ids, properties)
+
+        return cls(area_id=area_id, outline=outline, payload='{"type": "FeatureCollection", "features": [%s]}' % ', '.join(features),
+                   topology=json.dumps(topology, separators=(',', ':')))
+
+    @classmethod
+    def payload_for(cls, area_id, output_format='geojson'):
+        field = 'topology' if output_format == 'topojson' else 'payload'
+        payload = cls.objects.filter(area_id=area_id).values_list(field, flat=True).first()
+        if payload is None:
+            area_map = cls.build(area_id)
+            area_map.save()
+            payload = getattr(area_map, field)
+        return payload
+
+
+AREA_MEMBERSHIP_VERSION_KEY = 'areas:membership-version'
+
+# moves on every write to coordinators, their affiliations and areas; the admin's map payloads are tagged with it
+COORDINATOR_VERSION_KEY = 'areas:coordinator-version'
+
+# moves when precinct geometry or PrecinctShapes change; map payloads are tagged with it too
+PRECINCT_SHAPE_VERSION_KEY = 'areas:precinct-shape-version'
+
+
+# how long (in seconds) a process trusts the versions it last read from DataVersion
+VERSION_CHECK_INTERVAL = 1.0
+
+
+class DataVersion(models.Model):
+    """
+    A counter that moves whenever the data behind key changes. It lives in the
+    database so every web worker and management command shares it; each
+    process's lookup tables and payload caches are tagged with it.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    version = models.BigIntegerField(default=1)
+
+    # process-level {key: version}, re-read at most every VERSION_CHECK_INTERVAL
+    _versions = {'checked_at': None, 'versions': {}}
+
+    def __unicode__(self):
+        return '%s: %s' % (self.key, self.version)
+
+
+def cache_version(key):
+    versions = DataVersion._versions
+    now = time.time()
+    if versions['checked_at'] is None or now - versions['checked_at'] >= VERSION_CHECK_INTERVAL:
+        # one query for every key, so per-row callers (Affiliation.table) stay cheap
+        versions['versions'] = dict(DataVersion.objects.values_list('key', 'version'))
+        versions['checked_at'] = now
+    return versions['versions'].get(key, 0)
+
+
+def bump_cache_version(key):
+    """
+    Moves key's version once the current transaction commits (straight away
+    outside one), however many writes in it ask to. Writers don't hold the
+    DataVersion row locked for the rest of their transaction, and readers never
+    see a new version before the data behind it.
+    """
+    # Django forgets a rolled-back savepoint's callbacks, so this can't go stale
+    if any(getattr(func, 'version_key', None) == key for sids, func in connection.run_on_commit):
+        return
+
+    def bump():
+        if not DataVersion.objects.filter(key=key).update(version=models.F('version') + 1):
+            try:
+                with transaction.atomic():
+                    DataVersion.objects.create(key=key, version=1)
+            except IntegrityError:
+                DataVersion.objects.filter(key=key).update(version=models.F('version') + 1)
+        # this process sees its own writes straight away
+        DataVersion._versions['checked_at'] = None
+    bump.version_key = key
+    transaction.on_commit(bump)
+
+
+def coordinators_changed():
+    bump_cache_version(COORDINATOR_VERSION_KEY)
+
+
+AFFILIATION_VERSION_KEY = 'areas:affiliation-version'
+
+# PrecinctCoordinator.affiliation_mask is a signed bigint
+MAX_AFFILIATION_BIT = 62
+
+
+class AreaPrecinctQuerySet(models.QuerySet):
+
+    def area_ids(self, precinct_ids):
+        """
+        Returns {precinct_id: area_id} for a batch of precincts in one query.
+        """
+        return dict(self.filter(precinct_id__in=precinct_ids).values_list('precinct_id', 'area_id'))
+
+
+class AreaPrecinct(models.Model):
+    """
+    Which Area a precinct belongs to. Seeded from Area.AREA_MAPS.
+    """
+    area = models.ForeignKey(Area, related_name='memberships')
+    precinct = models.OneToOneField(WaPrecinct, related_name='area_membership')
+
+    objects = AreaPrecinctQuerySet.as_manager()
+
+    # process-level {precinct_id: area_id}, reloaded whenever the DataVersion moves
+    _lookup = {'version': None, 'areas': None}
+
+    class Meta:
+        verbose_name = 'Area Precinct'
+
+    def __unicode__(self):
+        return '%s in %s' % (self.precinct_id, self.area_id)
+
+    def save(self, *args, **kwargs):
+        previous_area_id, previous_precinct_id = (self.pk and AreaPrecinct.objects.filter(pk=self.pk)
+                                                  .values_list('area_id', 'precinct_id').first()) or (None, None)
+        super(AreaPrecinct, self).save(*args, **kwargs)
+        AreaPrecinct.membership_changed()
+        AreaMap.refresh([self.area_id, previous_area_id])
+
+        # tiles color each precinct by its area
+        from .tiles import invalidate_precinct_tiles
+        invalidate_precinct_tiles([self.precinct_id, previous_precinct_id])
+
+    @classmethod
+    def membership_changed(cls):
+        cls._lookup['areas'] = None
+        bump_cache_version(AREA_MEMBERSHIP_VERSION_KEY)
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Makes the memberships match Area.AREA_MAPS, replacing any changed in the
+        admin; a precinct listed in two areas keeps its first. Returns how many
+        precincts moved, joined or left an area.
+        """
+        memberships = {}
+        for area in Area.objects.filter(name__in=Area.AREA_MAPS.keys()).order_by('pk'):
+            for precinct_id in WaPrecinct.objects.filter(long_name__in=Area.AREA_MAPS[area.name]['precincts']).values_list('id', flat=True):
+                memberships.setdefault(precinct_id, area.id)
+
+        current = dict(cls.objects.values_list('precinct_id', 'area_id'))
+        left = set(current) - set(memberships)
+        moved = defaultdict(list)
+        for precinct_id, area_id in memberships.items():
+            if precinct_id in current and current[precinct_id] != area_id:
+                moved[area_id].append(precinct_id)
+        joined = set(memberships) - set(current)
+
+        with transaction.atomic():
+            # membership_deleted does the bookkeeping for each precinct that left
+            cls.objects.filter(precinct_id__in=left).delete()
+            for area_id, precinct_ids in moved.items():
+                cls.objects.filter(precinct_id__in=precinct_ids).update(area=area_id)
+            cls.objects.bulk_create([cls(precinct_id=precinct_id, area_id=memberships[precinct_id]) for precinct_id in joined])
+
+        changed = joined.union(*moved.values())
+        if changed:
+            cls.membership_changed()
+            AreaMap.refresh([current.get(precinct_id) for precinct_id in changed] + [memberships[precinct_id] for precinct_id in changed])
+
+            from .tiles import invalidate_precinct_tiles
+            invalidate_precinct_tiles(changed)
+        return len(left) + len(changed)
+
+    @classmethod
+    def lookup_table(cls):
+        version = cache_version(AREA_MEMBERSHIP_VERSION_KEY)
+        if cls._lookup['areas'] is None or cls._lookup['version'] != version:
+            cls._lookup['areas'] = dict(cls.objects.values_list('precinct_id', 'area_id'))
+            cls._lookup['version'] = version
+        return cls._lookup['areas']
+
+    @classmethod
+    def area_id_for(cls, precinct_id):
+        return cls.lookup_table().get(precinct_id)
+
+
 class Affiliation(models.Model):
     label = models.CharField(max_length=60)
     slug = models.SlugField(unique=True)
+    bit = models.PositiveSmallIntegerField(unique=True, null=True, editable=False, help_text='Its flag in PrecinctCoordinator.affiliation_mask')
+
+    # process-level [(mask, slug, label)] in bit order, reloaded whenever the DataVersion moves
+    _table = {'version': None, 'rows': None}
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.label)
+        if self.bit is None:
+            self.bit = Affiliation.next_bit()
         super(Affiliation, self).save(*args, **kwargs)
+        Affiliation.table_changed()
+
+    def delete(self, *args, **kwargs):
+        holders = list(PrecinctCoordinator.objects.with_affiliations(self.mask).values_list('pk', flat=True))
+        result = super(Affiliation, self).delete(*args, **kwargs)
+        Affiliation.table_changed()
+        PrecinctCoordinator.refresh_affiliation_masks(holders)
+        return result
 
     def __unicode__(self):
         return self.label
 
+    @property
+    def mask(self):
+        return 1 << self.bit
+
+    @classmethod
+    def next_bit(cls):
+        used = set(cls.objects.exclude(bit=None).values_list('bit', flat=True))
+        for bit in range(MAX_AFFILIATION_BIT + 1):
+            if bit not in used:
+                return bit
+        raise ValueError('PrecinctCoordinator.affiliation_mask has room for only %s affiliations' % (MAX_AFFILIATION_BIT + 1))
+
+    @classmethod
+    def table_changed(cls):
+        cls._table['rows'] = None
+        bump_cache_version(AFFILIATION_VERSION_KEY)
+        coordinators_changed()
+
+    @classmethod
+    def table(cls):
+        version = cache_version(AFFILIATION_VERSION_KEY)
+        if cls._table['rows'] is None or cls._table['version'] != version:
+            cls._table['rows'] = [(1 << bit, slug, label) for bit, slug, label in cls.objects.exclude(bit=None).order_by('bit').values_list('bit', 'slug', 'label')]
+            cls._table['version'] = version
+        return cls._table['rows']
+
+    @classmethod
+    def mask_for(cls, slugs):
+        slugs = set(slugs)
+        return sum(mask for mask, slug, label in cls.table() if slug in slugs)
+
+    @classmethod
+    def slugs_for(cls, affiliation_mask):
+        return [slug for mask, slug, label in cls.table() if affiliation_mask & mask]
+
+    @classmethod
+    def labels_for(cls, affiliation_mask):
+        return [label for mask, slug, label in cls.table() if affiliation_mask & mask]
+
 
 STATUSES = (
         (None, '-'),
@@ -121,6 +594,12 @@ STATUSES = (
         ('will-not-walk', 'Will Not Walk'),
     )
 
+# statuses from least to most progress; a precinct's status is its best coordinator's.
+STATUS_PROGRESS = ['will-not-walk', None, 'email', 'voicemail', 'will-walk', 'picked-up-packet', 'walked', 'data-entered']
+
+# a precinct with a coordinator in any of these statuses has someone walking it
+WALKER_STATUSES = ['will-walk', 'picked-up-packet', 'walked', 'data-entered']
+
 AFFILIATIONS = (
         (None, 'Other / No Data'),
         ('elected', 'Elected PCO, pre-reorg'),
@@ -131,6 +610,41 @@ AFFILIATIONS = (
         ('volunteer', 'Volunteer'),
     )
 
+# what save() remembers of a coordinator to tell what later changed
+TRACKED_FIELDS = ('status', 'area_id', 'precinct_id', 'full_name', 'email', 'phone_number')
+
+# a coordinator's name, email, phone numbers (as entered and as bare digits) and precinct,
+# lowercased, for the admin search's trigram index
+SEARCH_DOCUMENT_SQL = """
+    UPDATE areas_precinctcoordinator AS coordinator
+       SET search_document = lower(concat_ws(' ', coordinator.full_name, coordinator.email, coordinator.phone_number,
+                                             regexp_replace(coalesce(coordinator.phone_number, ''), '[^0-9\\n]+', '', 'g'),
+                                             precinct.long_name))
+      FROM wa_precincts AS precinct
+     WHERE precinct.id = coordinator.precinct_id
+"""
+
+
+class PrecinctCoordinatorQuerySet(models.QuerySet):
+
+    def with_affiliations(self, mask):
+        """
+        Coordinators with every affiliation in mask, read from affiliation_mask
+        rather than joined through the affiliations table.
+        """
+        return self.annotate(matching_affiliations=models.F('affiliation_mask').bitand(mask)).filter(matching_affiliations=mask)
+
+    def with_phone_number(self, text):
+        """
+        Coordinators with this number, however it was written; one lookup on PhoneNumber.number.
+        Nobody, if text isn't a phone number.
+        """
+        number = normalize_phone_number(text)
+        if number is None:
+            return self.none()
+        return self.filter(phone_numbers__number=number).distinct()
+
+
 class PrecinctCoordinator(models.Model):
     area = models.ForeignKey(Area, null=True, blank=True)
     precinct = models.ForeignKey(WaPrecinct)
@@ -139,27 +653,391 @@ class PrecinctCoordinator(models.Model):
     phone_number = models.CharField(null=True, blank=True, max_length=1024)
     # affiliation = models.CharField(default=None, choices=AFFILIATIONS, null=True, blank=True, max_length=32, help_text='')
     affiliations = models.ManyToManyField(Affiliation, blank=True)
-    status = models.CharField(default=None, choices=STATUSES, null=True, blank=True, max_length=32)
+    # the affiliations' Affiliation.mask flags, kept in step with the m2m for the changelist
+    affiliation_mask = models.BigIntegerField(default=0, editable=False)
+    # written by refresh_search_documents()
+    search_document = models.TextField(blank=True, default='', editable=False)
+    status = models.CharField(default=None, choices=STATUSES, null=True, blank=True, max_length=32, db_index=True)
     notes = models.TextField(null=True, blank=True)
     mini_van = models.BooleanField(default=False, verbose_name='MiniVAN')
 
+    objects = PrecinctCoordinatorQuerySet.as_manager()
+
     def __unicode__(self):
         return self.full_name
 
-    def save(self, *args, **kwargs):
-        if not self.area:
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(PrecinctCoordinator, cls).from_db(db, field_names, values)
+        # remember what we loaded, so save() can tell which fields really changed.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def changed_fields(self, *attnames):
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return set(attnames)
+        return set(name for name in attnames if name in loaded and loaded[name] != getattr(self, name))
 
+    def save(self, *args, **kwargs):
+        if not self.area_id:
             # look up corresponding area
-            area_name = None
-            for k,v in Area.AREA_MAPS.iteritems():
-                if self.precinct.long_name in v['precincts']:
-                    area_name = k
-                    break
-            
-            if area_name:
-                self.area = Area.objects.get(name=area_name)
-        return super(PrecinctCoordinator, self).save(*args, **kwargs)
+            self.area_id = AreaPrecinct.area_id_for(self.precinct_id)
+
+        loaded = getattr(self, '_loaded_values', {})
+        map_changed = self.changed_fields('status', 'area_id', 'precinct_id')
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # these are written by refresh_affiliation_masks and refresh_search_documents; don't put back stale copies
+            kwargs['update_fields'] = [f.attname for f in self._meta.concrete_fields
+                                       if not f.primary_key and f.attname not in ('affiliation_mask', 'search_document')]
+        result = super(PrecinctCoordinator, self).save(*args, **kwargs)
+
+        if map_changed:
+            if self.changed_fields('area_id', 'precinct_id'):
+                AreaMap.coordinator_moved([(self.area_id, self.precinct_id), (loaded.get('area_id'), loaded.get('precinct_id'))])
+
+            if self.status != loaded.get('status'):
+                StatusChange.objects.create(coordinator=self, area_id=self.area_id, old_status=loaded.get('status'),
+                                            new_status=self.status, changed_by=getattr(self, '_changed_by', None))
+
+            status_deltas = Counter({(self.area_id, self.status): 1})
+            if loaded:
+                status_deltas[(loaded.get('area_id'), loaded.get('status'))] -= 1
+            PrecinctCoordinator.bulk_written([self.precinct_id, loaded.get('precinct_id')], status_deltas)
+
+        if self.changed_fields('full_name', 'email', 'phone_number', 'precinct_id'):
+            PrecinctCoordinator.refresh_search_documents(coordinator_ids=[self.pk])
+        if self.changed_fields('phone_number'):
+            PhoneNumber.sync([self])
+
+        self._loaded_values = dict((name, getattr(self, name)) for name in TRACKED_FIELDS)
+        if not map_changed:
+            # bulk_written has already done it
+            coordinators_changed()
+        return result
+
+    @classmethod
+    def bulk_written(cls, precinct_ids, status_deltas=None):
+        """
+        Refreshes whatever is derived from the coordinators in these precincts.
+        status_deltas is a Counter of {(area_id, status): change in coordinators}.
+        save() and coordinator_deleted call this; bulk_create() and update() callers must too.
+        """
+        precinct_ids = [pk for pk in set(precinct_ids) if pk]
+        PrecinctStatus.refresh(precinct_ids)
+        if status_deltas:
+            AreaStatusCount.apply(status_deltas)
+
+        from .tiles import invalidate_precinct_tiles
+        invalidate_precinct_tiles(precinct_ids)
+        coordinators_changed()
+
+    @classmethod
+    def save_changed(cls, changes, batch_size=500):
+        """
+        Writes [(coordinator, changed attnames)] for coordinators loaded from the
+        database: one UPDATE per distinct set of new values (and batch_size rows)
+        instead of a save() each, then save()'s bookkeeping for all of them at once.
+        """
+        areas = AreaPrecinct.lookup_table()
+        updates = defaultdict(list)
+        status_changes = []
+        placements = []
+        precinct_ids = []
+        searchable_ids = []
+        phone_changes = []
+        status_deltas = Counter()
+
+        for coordinator, attnames in changes:
+            attnames = set(attnames) - set(['affiliation_mask'])
+            if not coordinator.area_id:
+                coordinator.area_id = areas.get(coordinator.precinct_id)
+                attnames.add('area_id')
+            if not attnames:
+                continue
+            updates[tuple((attname, getattr(coordinator, attname)) for attname in sorted(attnames))].append(coordinator.pk)
+
+            if attnames & set(['full_name', 'email', 'phone_number', 'precinct_id']):
+                searchable_ids.append(coordinator.pk)
+            if 'phone_number' in attnames:
+                phone_changes.append(coordinator)
+
+            loaded = getattr(coordinator, '_loaded_values', {})
+            if attnames & set(['status', 'area_id', 'precinct_id']):
+                if attnames & set(['area_id', 'precinct_id']):
+                    placements.extend([(coordinator.area_id, coordinator.precinct_id), (loaded.get('area_id'), loaded.get('precinct_id'))])
+                if 'status' in attnames:
+                    status_changes.append(StatusChange(coordinator=coordinator, area_id=coordinator.area_id, old_status=loaded.get('status'),
+                                                       new_status=coordinator.status, changed_by=getattr(coordinator, '_changed_by', None)))
+                status_deltas[(coordinator.area_id, coordinator.status)] += 1
+                status_deltas[(loaded.get('area_id'), loaded.get('status'))] -= 1
+                precinct_ids.extend([coordinator.precinct_id, loaded.get('precinct_id')])
+            coordinator._loaded_values = dict((name, getattr(coordinator, name)) for name in TRACKED_FIELDS)
+
+        if not updates:
+            return
+        with transaction.atomic():
+            for values, pks in updates.items():
+                for start in range(0, len(pks), batch_size):
+                    cls.objects.filter(pk__in=pks[start:start + batch_size]).update(**dict(values))
+            StatusChange.objects.bulk_create(status_changes)
+            if searchable_ids:
+                cls.refresh_search_documents(coordinator_ids=searchable_ids)
+            if phone_changes:
+                PhoneNumber.sync(phone_changes)
+
+        if placements:
+            AreaMap.coordinator_moved(placements)
+        if precinct_ids:
+            cls.bulk_written(precinct_ids, Counter(dict((key, delta) for key, delta in status_deltas.items() if delta)))
+        else:
+            coordinators_changed()
+
+    def shares_phone_with(self):
+        """
+        Other coordinators with one of this coordinator's phone numbers.
+        """
+        numbers = [phone.number for phone in self.phone_numbers.all()]
+        return PrecinctCoordinator.objects.filter(phone_numbers__number__in=numbers).exclude(pk=self.pk).distinct()
+
+    @classmethod
+    def refresh_search_documents(cls, coordinator_ids=None, precinct_ids=None):
+        """
+        Rebuilds search_document in the database for these coordinators, or the
+        coordinators in these precincts, or (given neither) everyone.
+        """
+        sql, params = SEARCH_DOCUMENT_SQL, []
+        if coordinator_ids is not None:
+            sql += ' AND coordinator.id = ANY(%s)'
+            params.append(list(coordinator_ids))
+        if precinct_ids is not None:
+            sql += ' AND coordinator.precinct_id = ANY(%s)'
+            params.append(list(precinct_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    @classmethod
+    def refresh_affiliation_masks(cls, coordinator_ids):
+        """
+        Recomputes affiliation_mask from the affiliations table for these coordinators,
+        returning {coordinator_id: mask}. Writers of the through table other than
+        the m2m manager (which signals) must call this.
+        """
+        masks = dict((pk, 0) for pk in coordinator_ids)
+        rows = cls.affiliations.through.objects.filter(precinctcoordinator_id__in=masks).exclude(affiliation__bit=None)
+        for coordinator_id, bit in rows.values_list('precinctcoordinator_id', 'affiliation__bit'):
+            masks[coordinator_id] |= 1 << bit
+
+        by_mask = defaultdict(list)
+        for coordinator_id, mask in masks.items():
+            by_mask[mask].append(coordinator_id)
+        for mask, ids in by_mask.items():
+            cls.objects.filter(pk__in=ids).update(affiliation_mask=mask)
+        coordinators_changed()
+        return masks
+
+    class Meta:
+        ordering = ('precinct__long_name', 'status', 'full_name')
+
+
+class PhoneNumber(models.Model):
+    """
+    One of a coordinator's numbers, parsed out of PrecinctCoordinator.phone_number
+    whenever that's written.
+    """
+    coordinator = models.ForeignKey(PrecinctCoordinator, related_name='phone_numbers')
+    number = models.CharField(max_length=16, db_index=True, help_text='E.164, e.g. +12065550100')
+    label = models.CharField(max_length=16, blank=True, help_text='cell, home, work or fax, when noted')
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ('coordinator', 'position')
+        unique_together = ('coordinator', 'number')
 
+    def __unicode__(self):
+        if self.label:
+            return '%s (%s)' % (format_phone_number(self.number), self.label)
+        return format_phone_number(self.number)
+
+    @classmethod
+    def sync(cls, coordinators):
+        """
+        Replaces these coordinators' rows with what their phone_number fields hold now.
+        """
+        coordinators = [c for c in coordinators if c.pk]
+        with transaction.atomic():
+            cls.objects.filter(coordinator_id__in=[c.pk for c in coordinators]).delete()
+            cls.objects.bulk_create([
+                cls(coordinator_id=coordinator.pk, number=number, label=label, position=position)
+                for coordinator in coordinators
+                for position, (number, label) in enumerate(parse_phone_numbers(coordinator.phone_number))
+            ])
+
+
+class PrecinctStatus(models.Model):
+    """
+    Per-precinct rollup of its coordinators, kept current by PrecinctCoordinator.bulk_written()
+    and rebuilt from scratch by rebuild_precinct_status.
+    """
+    precinct = models.OneToOneField(WaPrecinct, primary_key=True, related_name='status_rollup')
+    area = models.ForeignKey(Area, null=True, blank=True)
+    best_status = models.CharField(default=None, choices=STATUSES, null=True, blank=True, max_length=32)
+    coordinator_count = models.PositiveIntegerField(default=0)
+    has_walker = models.BooleanField(default=False, db_index=True)
+
+    class Meta:
+        verbose_name_plural = 'Precinct Statuses'
+
+    def __unicode__(self):
+        return '%s: %s' % (self.precinct_id, self.best_status)
+
+    @classmethod
+    def compute(cls, coordinators):
+        """
+        Unsaved PrecinctStatus rows for every precinct in a PrecinctCoordinator queryset, in one query.
+        """
+        rank = models.Case(*[models.When(status=status, then=models.Value(i)) for i, status in enumerate(STATUS_PROGRESS) if status],
+                           default=models.Value(STATUS_PROGRESS.index(None)), output_field=models.IntegerField())
+        walker = models.Case(models.When(status__in=WALKER_STATUSES, then=models.Value(1)), default=models.Value(0), output_field=models.IntegerField())
+
+        rows = coordinators.order_by().values('precinct_id').annotate(
+            best_rank=models.Max(rank), walkers=models.Max(walker), count=models.Count('id'), area_id=models.Max('area_id'))
+        areas = AreaPrecinct.lookup_table()
+        return [cls(
+            precinct_id=row['precinct_id'],
+            area_id=areas.get(row['precinct_id'], row['area_id']),
+            best_status=STATUS_PROGRESS[row['best_rank']],
+            coordinator_count=row['count'],
+            has_walker=bool(row['walkers']),
+        ) for row in rows]
+
+    @classmethod
+    def refresh(cls, precinct_ids):
+        if not precinct_ids:
+            return
+        with transaction.atomic():
+            cls.objects.filter(precinct_id__in=precinct_ids).delete()
+            cls.objects.bulk_create(cls.compute(PrecinctCoordinator.objects.filter(precinct_id__in=precinct_ids)))
+
+
+DASHBOARD_CACHE_KEY = 'areas:dashboard:%s'
+
+
+class AreaStatusCount(models.Model):
+    """
+    How many coordinators in an area have a status, adjusted on every write
+    (see PrecinctCoordinator.bulk_written) so the dashboard never has to count.
+    """
+    area = models.ForeignKey(Area, null=True, blank=True)
+    status = models.CharField(default=None, choices=STATUSES, null=True, blank=True, max_length=32)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('area', 'status')
+
+    def __unicode__(self):
+        return '%s / %s: %s' % (self.area_id, self.status, self.count)
+
+    @classmethod
+    def apply(cls, deltas):
+        for (area_id, status), delta in deltas.items():
+            if not delta:
+                continue
+            if not cls.objects.filter(area_id=area_id, status=status).update(count=models.F('count') + delta):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(area_id=area_id, status=status, count=delta)
+                except IntegrityError:
+                    cls.objects.filter(area_id=area_id, status=status).update(count=models.F('count') + delta)
+
+    @classmethod
+    def rebuild(cls):
+        counts = PrecinctCoordinator.objects.order_by().values('area_id', 'status').annotate(count=models.Count('id'))
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create([cls(area_id=row['area_id'], status=row['status'], count=row['count']) for row in counts])
+        coordinators_changed()
+
+
+class StatusChange(models.Model):
+    coordinator = models.ForeignKey(PrecinctCoordinator, null=True, blank=True, on_delete=models.SET_NULL, related_name='status_changes')
+    area = models.ForeignKey(Area, null=True, blank=True, on_delete=models.SET_NULL)
+    old_status = models.CharField(default=None, choices=STATUSES, null=True, blank=True, max_length=32)
+    new_status = models.CharField(default=None, choices=STATUSES, null=True, blank=True, max_length=32)
+    changed_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ('-changed_at',)
+
+    def __unicode__(self):
+        return '%s: %s -> %s' % (self.coordinator_id, self.old_status, self.new_status)
+
+
+class ImportRecord(models.Model):
+    """
+    What a row of a recurring export (keyed within its source) last said, as a
+    hash, and the coordinator it became; see areas.imports.ImportLedger.
+    """
+    source = models.CharField(max_length=64)
+    source_key = models.CharField(max_length=255)
+    content_hash = models.CharField(max_length=40)
+    coordinator = models.ForeignKey(PrecinctCoordinator, null=True, blank=True, on_delete=models.SET_NULL, related_name='import_records')
+    imported_at = models.DateTimeField(auto_now=True)
+    removed_at = models.DateTimeField(null=True, blank=True, help_text='When the row was first missing from its export')
 
     class Meta:
-        ordering = ('precinct__long_name', 'status', 'full_name')
\ No newline at end of file
+        unique_together = ('source', 'source_key')
+
+    def __unicode__(self):
+        return '%s: %s' % (self.source, self.source_key)
+
+
+# areas partway through being deleted, whose coordinators go with them
+_deleting_area_ids = set()
+
+
+@receiver(pre_delete, sender=Area)
+def area_deleting(sender, instance, **kwargs):
+    _deleting_area_ids.add(instance.pk)
+
+
+@receiver(post_delete, sender=Area)
+def area_deleted(sender, instance, **kwargs):
+    _deleting_area_ids.discard(instance.pk)
+
+
+@receiver(post_delete, sender=AreaPrecinct)
+def membership_deleted(sender, instance, **kwargs):
+    # sent for memberships deleted along with their area or precinct, too
+    AreaPrecinct.membership_changed()
+    if instance.area_id not in _deleting_area_ids:
+        AreaMap.refresh([instance.area_id])
+
+    from .tiles import invalidate_precinct_tiles
+    invalidate_precinct_tiles([instance.precinct_id])
+
+
+@receiver(post_delete, sender=PrecinctCoordinator)
+def coordinator_deleted(sender, instance, **kwargs):
+    # sent for each row of a queryset delete() too, unlike Model.delete()
+    if instance.area_id in _deleting_area_ids:
+        # its counts and map are being deleted along with the area
+        PrecinctCoordinator.bulk_written([instance.precinct_id])
+        return
+    PrecinctCoordinator.bulk_written([instance.precinct_id], Counter({(instance.area_id, instance.status): -1}))
+    AreaMap.coordinator_moved([(instance.area_id, instance.precinct_id)])
+
+
+@receiver(m2m_changed, sender=PrecinctCoordinator.affiliations.through)
+def coordinator_affiliations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # an affiliation is being cleared of its coordinators; they're gone from the table by post_clear
+        instance._cleared_coordinator_ids = list(instance.precinctcoordinator_set.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        PrecinctCoordinator.refresh_affiliation_masks(pk_set if action != 'post_clear' else instance.__dict__.pop('_cleared_coordinator_ids', []))
+    else:
+        instance.affiliation_mask = PrecinctCoordinator.refresh_affiliation_masks([instance.pk])[instance.pk]
@@ -0,0 +1,195 @@
+"""
+Helpers shared by the NationBuilder import commands: turning an export row into
+coordinator fields, and matching rows without a precinct code against the
+voter registration database.
+"""
+from .models import Affiliation, PrecinctCode, PrecinctCoordinator
+from .resolver import LATITUDE_FIELDS, LONGITUDE_FIELDS
+
+
+LEGISLATIVE_DISTRICT = '46'
+
+# columns added to the review file next to the original export's
+REVIEW_FIELDS = ['candidates', 'candidate_precinct_codes', 'choice']
+
+# an address score at or above this (house number and street name both found) is trusted
+ADDRESS_MATCH_SCORE = 4
+
+# the import ledger's name for NationBuilder rows
+LEDGER_SOURCE = 'nationbuilder'
+
+# the export columns an import reads; a change anywhere else in a row isn't worth re-importing it for
+LEDGER_FIELDS = ['full_name', 'email1', 'phone_number', 'tag_list', 'precinct_code', 'first_name', 'last_name', 'primary_address1']
+
+
+def ledger_fields(fieldnames):
+    """
+    (key fields, hash fields) for an export with these columns.
+    """
+    # without an id, the address keeps two people of the same name (and no email) apart
+    key_fields = ['nationbuilder_id'] if 'nationbuilder_id' in fieldnames else ['email1', 'full_name', 'primary_address1']
+    hash_fields = LEDGER_FIELDS + [f for f in fieldnames if f in LATITUDE_FIELDS + LONGITUDE_FIELDS]
+    return key_fields, hash_fields
+
+
+def coordinator_data(line):
+    data = {
+        'full_name': line['full_name'],
+        'email': line['email1'],
+        'phone_number': line['phone_number'],
+    }
+
+    if "clinton" in line['tag_list'].lower():
+        notes = "Clinton"
+    elif "sanders" in line['tag_list'].lower():
+        notes = "Sanders"
+    else:
+        notes = "Precinct"
+
+    notes += " Delegate"
+
+    if "statedel" in line['tag_list'].lower():
+        notes += ", State Delegate"
+    elif "statealt" in line['tag_list'].lower():
+        notes += ", State Alternate"
+
+    data['notes'] = notes
+    return data
+
+
+def create_coordinator(data, precinct_id):
+    """
+    get_or_create a delegate coordinator; returns (coordinator, created).
+    """
+    coordinator, created = PrecinctCoordinator.objects.get_or_create(precinct_id=precinct_id, **data)
+    if created:
+        coordinator.affiliations.add(Affiliation.objects.get(slug='delegate'))
+    return coordinator, created
+
+
+class PrecinctFinder(object):
+    """
+    Resolves the precinct codes NationBuilder and the voter database use, remembering
+    each answer so a code is only ever looked up once per run.
+    """
+
+    def __init__(self):
+        self.found = {}
+
+    def by_code(self, code):
+        """
+        A precinct_code column from the export: either a four digit code or a longer precinct name.
+        """
+        if len(code) == 4 or len(code) >= 7:
+            return self._get(code)
+        return None
+
+    def by_voter_code(self, code):
+        """
+        A precinctcode from wa_voter.
+        """
+        return self._get(str(code))
+
+    def _get(self, code):
+        if code not in self.found:
+            self.found[code] = PrecinctCode.objects.precinct_id(code, legislative_district=LEGISLATIVE_DISTRICT)
+        return self.found[code]
+
+
+def address_score(voter, address):
+    address = address.upper()
+    score = 0
+    if voter['regstnum'] and str(voter['regstnum']) in address:
+        score += 2
+    if voter['regstname'] and voter['regstname'] in address:
+        score += 2
+    for direction in ('regstpredirection', 'regstpostdirection'):
+        if voter[direction] and (' %s ' % voter[direction]) in (' %s ' % address):
+            score += 1
+    return score
+
+
+def describe_voter(voter):
+    return "%s %s, %s %s %s %s, %s" % (voter['fname'], voter['lname'], voter['regstnum'], voter['regstpredirection'], voter['regstname'], voter['regstpostdirection'], voter['precinctcode'])
+
+
+class VoterMatcher(object):
+    """
+    Looks voters up by (first name, last name) for many export rows per query.
+    """
+
+    def __init__(self, database, batch_size=200):
+        self.database = database
+        self.batch_size = batch_size
+
+    def key(self, line):
+        """
+        What lookup() files a line's candidates under.
+        """
+        return (line['first_name'].upper(), line['last_name'].upper())
+
+    def lookup(self, lines):
+        """
+        Returns {(FNAME, LNAME): [voter, ...]} for every line's name.
+        """
+        keys = sorted(set((line['first_name'].upper(), line['last_name'].upper()) for line in lines))
+        voters = dict((key, []) for key in keys)
+
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start:start + self.batch_size]
+            params = {'legislative_district': LEGISLATIVE_DISTRICT}
+            pairs = []
+            for i, (first_name, last_name) in enumerate(batch):
+                params['first_name_%s' % i] = first_name
+                params['last_name_%s' % i] = last_name
+                pairs.append('(:first_name_%s, :last_name_%s)' % (i, i))
+
+            rows = self.database.query('SELECT * FROM wa_voter WHERE legislativedistrict = :legislative_district AND (FName, LName) IN (%s)' % ', '.join(pairs), **params).all()
+            for voter in rows:
+                key = (voter['fname'].upper(), voter['lname'].upper())
+                if key in voters:
+                    voters[key].append(voter)
+        return voters
+
+    def resolve(self, line, candidates):
+        """
+        Picks the candidate voter for line when the address makes it clear; returns
+        (voter, None) when resolved, or (None, ranked candidates) when a person has to choose.
+        """
+        ranked = sorted(candidates, key=lambda voter: -address_score(voter, line['primary_address1']))
+        if not ranked:
+            return None, []
+
+        best = address_score(ranked[0], line['primary_address1'])
+        runner_up = address_score(ranked[1], line['primary_address1']) if len(ranked) > 1 else -1
+        if best >= ADDRESS_MATCH_SCORE and best > runner_up:
+            return ranked[0], None
+        return None, ranked
+
+
+class IndexedVoterMatcher(VoterMatcher):
+    """
+    A VoterMatcher that reads a local VoterIndex (see build_voter_index) instead of
+    the voter database, so nicknames and misspelled names still find candidates.
+    """
+
+    # candidates need at least a sound-alike first name and a matching last name,
+    # however well the address matches
+    MIN_NAME_SCORE = 5
+
+    def __init__(self, index):
+        self.index = index
+
+    def key(self, line):
+        # the address ranks (and so limits) the candidates, so it's part of the key
+        return (line['first_name'].upper(), line['last_name'].upper(), line['primary_address1'].upper())
+
+    def lookup(self, lines):
+        voters = {}
+        for line in lines:
+            key = self.key(line)
+            if key not in voters:
+                candidates = self.index.candidates(line['first_name'], line['last_name'], line['primary_address1'],
+                                                   min_name_score=self.MIN_NAME_SCORE)
+                voters[key] = [voter for score, voter in candidates]
+        return voters
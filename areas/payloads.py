@@ -0,0 +1,102 @@
+"""
+Versioned ETags and a bounded in-process cache for the admin's map payloads.
+
+A payload's ETag covers the coordinator, area membership and precinct shape
+versions (see models.coordinators_changed) plus whatever in the request selects it, so a
+reload that nothing has changed under is answered with a 304, and a miss that
+another organizer already rendered is served from memory. The versions are
+DataVersion rows, so a write from any worker or management command moves every
+worker's ETags, and with them the keys into its rendered_payloads.
+"""
+from collections import OrderedDict
+import hashlib
+import threading
+
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .models import AREA_MEMBERSHIP_VERSION_KEY, COORDINATOR_VERSION_KEY, PRECINCT_SHAPE_VERSION_KEY, cache_version
+
+
+class LRUCache(object):
+    """
+    Holds up to max_entries payloads and max_bytes of them, evicting the least
+    recently used first.
+    """
+
+    def __init__(self, max_entries=64, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.pop(key, None)
+            if value is not None:
+                self.entries[key] = value
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self.entries[key] = value
+            self.size += len(value)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                evicted_key, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+rendered_payloads = LRUCache()
+
+
+def payload_etag(request, *args, **kwargs):
+    """
+    etag_func for django.views.decorators.http.condition: the data versions, the
+    path and the sorted query string, hashed.
+    """
+    parts = [cache_version(COORDINATOR_VERSION_KEY), cache_version(AREA_MEMBERSHIP_VERSION_KEY), cache_version(PRECINCT_SHAPE_VERSION_KEY),
+             request.path]
+    parts.extend('%s=%s' % (key, value) for key, values in sorted(request.GET.lists()) for value in values)
+    return hashlib.md5('\n'.join(unicode(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def cached_payload(key, render, content_type='application/json'):
+    """
+    Serves the payload stored under key (usually the request's payload_etag) from
+    rendered_payloads, or else from render(), which may return a string or an
+    iterator of strings. An iterator is streamed as usual and only kept once it
+    has been sent in full, and only if it fits in the cache.
+    """
+    payload = rendered_payloads.get(key)
+    if payload is not None:
+        return HttpResponse(payload, content_type=content_type)
+
+    payload = render()
+    if isinstance(payload, basestring):
+        rendered_payloads.set(key, payload)
+        return HttpResponse(payload, content_type=content_type)
+
+    def stream():
+        # kept only while it could still fit; past that the payload streams in flat memory
+        chunks, size = [], 0
+        for chunk in payload:
+            if chunks is not None:
+                size += len(chunk)
+                if size > rendered_payloads.max_bytes:
+                    chunks = None
+                else:
+                    chunks.append(chunk)
+            yield chunk
+        if chunks is not None:
+            rendered_payloads.set(key, ''.join(chunks))
+    return StreamingHttpResponse(stream(), content_type=content_type)
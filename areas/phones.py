@@ -0,0 +1,68 @@
+"""
+Parsing the free-text PrecinctCoordinator.phone_number into E.164 numbers.
+"""
+import re
+
+
+# North American numbers, unless written with a +country code
+DEFAULT_COUNTRY_CODE = '1'
+
+LABELS = {
+    'c': 'cell', 'cell': 'cell', 'm': 'cell', 'mobile': 'cell',
+    'h': 'home', 'home': 'home',
+    'w': 'work', 'work': 'work', 'o': 'work', 'office': 'work',
+    'fax': 'fax',
+}
+
+# "206-555-0100 / 425-555-0199" and "... or ..." list two numbers, but "206/555-0100" is one
+SEPARATOR_RE = re.compile(r'[\n,;]+|/(?!\s*\d{3}[-.\s]?\d{4}\b)|\s+or\s+', re.I)
+EXTENSION_RE = re.compile(r'\s*(?:x|ext\.?|extension)\s*\d+\s*$', re.I)
+WORD_RE = re.compile(r'[a-z]+')
+
+
+def normalize_phone_number(text):
+    """
+    The E.164 form of one number ('+12065550100'), or None if it isn't one.
+    """
+    text = EXTENSION_RE.sub('', text or '').strip()
+    digits = re.sub(r'\D', '', text)
+    if text.startswith('+'):
+        return '+' + digits if 8 <= len(digits) <= 15 else None
+    if len(digits) == 10:
+        return '+' + DEFAULT_COUNTRY_CODE + digits
+    if len(digits) == 11 and digits.startswith(DEFAULT_COUNTRY_CODE):
+        return '+' + digits
+    return None
+
+
+def phone_label(text):
+    for word in WORD_RE.findall(EXTENSION_RE.sub('', text).lower()):
+        if word in LABELS:
+            return LABELS[word]
+    return ''
+
+
+def parse_phone_numbers(text):
+    """
+    [(e164, label)] for each distinct number in a phone_number field, in order.
+    """
+    numbers = []
+    for part in SEPARATOR_RE.split(text or ''):
+        number = normalize_phone_number(part)
+        if number and number not in [n for n, label in numbers]:
+            numbers.append((number, phone_label(part)))
+    return numbers
+
+
+def unparsed_phone_text(text):
+    """
+    The parts of a phone_number field that parse_phone_numbers found no number in,
+    e.g. "555-0101 (Jim)", as entered.
+    """
+    return [part.strip() for part in SEPARATOR_RE.split(text or '') if part.strip() and not normalize_phone_number(part)]
+
+
+def format_phone_number(number):
+    if number.startswith('+' + DEFAULT_COUNTRY_CODE) and len(number) == 12:
+        return '%s-%s-%s' % (number[2:5], number[5:8], number[8:])
+    return number
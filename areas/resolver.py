@@ -0,0 +1,117 @@
+"""
+Point-in-polygon precinct lookups against an in-memory copy of every precinct,
+indexed with a Sort-Tile-Recursive packed R-tree of bounding boxes and tested
+with prepared geometries.
+"""
+import math
+
+from django.contrib.gis.geos import Point
+
+from .models import WaPrecinct
+
+
+LATITUDE_FIELDS = ('latitude', 'lat', 'primary_lat')
+LONGITUDE_FIELDS = ('longitude', 'lng', 'lon', 'primary_lng')
+
+
+def line_coordinates(line):
+    """
+    (latitude, longitude) from an import CSV row, if it has them.
+    """
+    latitude = next((line[f] for f in LATITUDE_FIELDS if line.get(f)), None)
+    longitude = next((line[f] for f in LONGITUDE_FIELDS if line.get(f)), None)
+    try:
+        return float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+
+
+class STRtree(object):
+    """
+    A static R-tree, bulk loaded with Sort-Tile-Recursive packing. Entries are
+    ((xmin, ymin, xmax, ymax), item) and can't be added after construction.
+    """
+
+    def __init__(self, entries, node_capacity=10):
+        self.node_capacity = node_capacity
+        level = [(box, item, None) for box, item in entries]
+        while len(level) > node_capacity:
+            level = self._pack(level)
+        self.root = (self._union([node[0] for node in level]), None, level) if level else None
+
+    def _pack(self, nodes):
+        capacity = self.node_capacity
+        slices = int(math.ceil(math.sqrt(math.ceil(len(nodes) / float(capacity)))))
+        by_x = sorted(nodes, key=lambda node: node[0][0] + node[0][2])
+        slice_size = slices * capacity
+
+        parents = []
+        for start in range(0, len(by_x), slice_size):
+            by_y = sorted(by_x[start:start + slice_size], key=lambda node: node[0][1] + node[0][3])
+            for group_start in range(0, len(by_y), capacity):
+                children = by_y[group_start:group_start + capacity]
+                parents.append((self._union([child[0] for child in children]), None, children))
+        return parents
+
+    @staticmethod
+    def _union(boxes):
+        return (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+    def query_point(self, x, y):
+        """
+        Yields every item whose bounding box contains (x, y).
+        """
+        stack = [self.root] if self.root else []
+        while stack:
+            box, item, children = stack.pop()
+            if not (box[0] <= x <= box[2] and box[1] <= y <= box[3]):
+                continue
+            if children is None:
+                yield item
+            else:
+                stack.extend(children)
+
+
+class PrecinctResolver(object):
+    """
+    Loads every precinct geometry once; resolve() then answers lat/lon lookups
+    in memory. Use PrecinctResolver.shared() to reuse one per process.
+    """
+    _shared = None
+
+    def __init__(self, queryset=None):
+        queryset = (queryset if queryset is not None else WaPrecinct.objects.all()) \
+            .exclude(map_cache_geometry=None).only('id', 'long_name', 'map_cache_geometry')
+
+        self.names = {}
+        self.extents = {}
+        self.geometries = {}
+        for precinct in queryset.iterator():
+            geometry = precinct.map_cache_geometry
+            self.names[precinct.pk] = precinct.long_name
+            self.extents[precinct.pk] = geometry.extent
+            self.geometries[precinct.pk] = geometry.prepared
+        self.tree = STRtree((extent, precinct_id) for precinct_id, extent in self.extents.items())
+
+    @classmethod
+    def shared(cls):
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    @classmethod
+    def reset(cls):
+        cls._shared = None
+
+    def resolve_one(self, latitude, longitude):
+        point = Point(longitude, latitude, srid=4326)
+        for precinct_id in self.tree.query_point(longitude, latitude):
+            if self.geometries[precinct_id].covers(point):
+                return precinct_id
+        return None
+
+    def resolve(self, points):
+        """
+        Returns the precinct id (or None) for each (latitude, longitude) in points.
+        """
+        return [self.resolve_one(latitude, longitude) for latitude, longitude in points]
@@ -1,3 +1,534 @@
-from django.test import TestCase
+import json
+import math
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.admin import helpers
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import models, topojson
+from .dedup import DuplicateFinder, merge_clusters
+from .geojson import COORDINATOR_FEATURE_FIELDS
+from .mailmerge import MailMerge
+from .models import Affiliation, Area, AreaPrecinct, AreaStatusCount, PrecinctCoordinator, PrecinctShape, PrecinctStatus, StatusChange, \
+                    WaPrecinct, SHAPE_TOLERANCES, STATUSES
+from .phones import parse_phone_numbers, unparsed_phone_text
+from .tiles import ORIGIN_SHIFT, TILE_BUFFER, TILE_EXTENT, tile_bounds, tiles_for_extent
+
+
+class PrecinctCoordinatorChangelistTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('organizer', 'organizer@example.com', 'password')
+        cls.area = Area.objects.create(name='Wedgewood', slug='wedgewood', color='#065143')
+        cls.precincts = []
+        for i in range(3):
+            precinct = WaPrecinct.objects.create(
+                short_name='22%s' % i,
+                long_name='SEA 46-220%s' % i,
+                map_cache_geometry=MultiPolygon(Polygon.from_bbox((-122.3 + i * 0.01, 47.6, -122.29 + i * 0.01, 47.61)), srid=4326),
+            )
+            for tolerance in SHAPE_TOLERANCES:
+                PrecinctShape.objects.create(precinct=precinct, tolerance=tolerance, geojson='{"type": "MultiPolygon", "coordinates": []}',
+                                             centroid_x=-122.295 + i * 0.01, centroid_y=47.605, geometry_hash='')
+            PrecinctCoordinator.objects.create(area=cls.area, precinct=precinct, full_name='Walker %s' % i,
+                                               email='walker%s@example.com' % i, phone_number='206-555-000%s' % i)
+            cls.precincts.append(precinct)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertNoGeometryFetched(self, queries):
+        for query in queries:
+            self.assertNotIn('map_cache_geometry', query['sql'])
+
+    def test_table_does_not_fetch_geometry(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('admin:areas_precinctcoordinator_changelist'), {'show_map': 'False'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'SEA 46-2200')
+        self.assertNoGeometryFetched(context.captured_queries)
+
+    def filtered_queryset(self, params, ignore_params=()):
+        request = RequestFactory().get(reverse('admin:areas_precinctcoordinator_geojson'), params)
+        request.user = self.user
+        return request, admin.site._registry[PrecinctCoordinator].get_filtered_queryset(request, ignore_params)
+
+    def test_map_reads_cached_shapes(self):
+        # the features are read through a named cursor, which CaptureQueriesContext doesn't see
+        request, queryset = self.filtered_queryset({})
+        self.assertNotIn('map_cache_geometry', str(queryset.values_list(*COORDINATOR_FEATURE_FIELDS).query))
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('admin:areas_precinctcoordinator_geojson'))
+            content = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertNoGeometryFetched(context.captured_queries)
+        self.assertEqual(len(json.loads(content.decode('utf-8'))['features']), 3)
+
+    def test_filtered_queryset_leaves_the_request_alone(self):
+        request, queryset = self.filtered_queryset({'q': 'Walker 1', 'format': 'topojson'}, ignore_params=('format',))
+        self.assertEqual(request.GET['format'], 'topojson')
+        self.assertEqual([c.full_name for c in queryset], ['Walker 1'])
+
+    def test_geojson_applies_changelist_filters(self):
+        response = self.client.get(reverse('admin:areas_precinctcoordinator_geojson'), {'q': 'Walker 1'})
+        features = json.loads(b''.join(response.streaming_content).decode('utf-8'))['features']
+        self.assertEqual([f['properties']['precinct'] for f in features], ['SEA 46-2201'])
+
+
+class AreaCoordinatorInlineTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('organizer', 'organizer@example.com', 'password')
+        cls.area = Area.objects.create(name='Wedgewood', slug='wedgewood', color='#065143')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        # re-reading DataVersion on a timer would make the query counts depend on the clock
+        self.version_check_interval = models.VERSION_CHECK_INTERVAL
+        models.VERSION_CHECK_INTERVAL = 3600
+
+    def tearDown(self):
+        models.VERSION_CHECK_INTERVAL = self.version_check_interval
+
+    def fill_area(self, total):
+        for i in range(PrecinctCoordinator.objects.count(), total):
+            precinct = WaPrecinct.objects.create(short_name='23%02d' % i, long_name='SEA 46-23%02d' % i)
+            PrecinctCoordinator.objects.create(area=self.area, precinct=precinct, full_name='Walker %s' % i)
+
+    def change_page_queries(self, last_precinct):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('admin:areas_area_change', args=(self.area.pk,)))
+        self.assertContains(response, last_precinct)
+        return len(context.captured_queries)
+
+    def test_inline_queries_do_not_grow_with_rows(self):
+        self.fill_area(2)
+        self.change_page_queries('SEA 46-2301')  # warm the session and lookup caches
+        few = self.change_page_queries('SEA 46-2301')
+
+        self.fill_area(12)
+        self.change_page_queries('SEA 46-2311')  # new rows move the coordinator version; re-warm
+        self.assertEqual(self.change_page_queries('SEA 46-2311'), few)
+
+
+class StatusRollupTests(TestCase):
+
+    def status_counts(self):
+        return dict(((row.area_id, row.status), row.count) for row in AreaStatusCount.objects.exclude(count=0))
+
+    def precinct_statuses(self):
+        return dict((row.precinct_id, (row.area_id, row.best_status, row.coordinator_count))
+                    for row in PrecinctStatus.objects.all())
+
+    def test_save_move_and_delete(self):
+        north = Area.objects.create(name='North', slug='north', color='#065143')
+        south = Area.objects.create(name='South', slug='south', color='#93B5C6')
+        first = WaPrecinct.objects.create(short_name='2400', long_name='SEA 46-2400')
+        second = WaPrecinct.objects.create(short_name='2401', long_name='SEA 46-2401')
+
+        walker = PrecinctCoordinator.objects.create(area=north, precinct=first, full_name='Walker', status='will-walk')
+        PrecinctCoordinator.objects.create(area=north, precinct=first, full_name='Emailer', status='email')
+        self.assertEqual(self.status_counts(), {(north.pk, 'will-walk'): 1, (north.pk, 'email'): 1})
+        self.assertEqual(self.precinct_statuses(), {first.pk: (north.pk, 'will-walk', 2)})
+
+        walker.status = 'walked'
+        walker.save()
+        self.assertEqual(self.status_counts(), {(north.pk, 'walked'): 1, (north.pk, 'email'): 1})
+
+        walker.area, walker.precinct = south, second
+        walker.save()
+        self.assertEqual(self.status_counts(), {(south.pk, 'walked'): 1, (north.pk, 'email'): 1})
+        self.assertEqual(self.precinct_statuses(), {first.pk: (north.pk, 'email', 1), second.pk: (south.pk, 'walked', 1)})
+
+        walker.delete()
+        self.assertEqual(self.status_counts(), {(north.pk, 'email'): 1})
+        self.assertEqual(self.precinct_statuses(), {first.pk: (north.pk, 'email', 1)})
+
+        AreaStatusCount.rebuild()
+        self.assertEqual(self.status_counts(), {(north.pk, 'email'): 1})
+
+    def test_dashboard_requires_permission(self):
+        self.client.force_login(User.objects.create_user('walker', 'walker@example.com', 'password', is_staff=True))
+        self.assertEqual(self.client.get(reverse('admin:areas_area_dashboard')).status_code, 403)
+
+
+class AreaMapViewTests(TestCase):
+
+    def test_missing_area(self):
+        self.client.force_login(User.objects.create_superuser('organizer', 'organizer@example.com', 'password'))
+        self.assertEqual(self.client.get(reverse('admin:areas_area_map', args=(999,))).status_code, 404)
+        self.assertFalse(models.AreaMap.objects.exists())
+
+
+class DuplicateCoordinatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('organizer', 'organizer@example.com', 'password')
+        cls.area = Area.objects.create(name='Wedgewood', slug='wedgewood', color='#065143')
+        cls.precinct = WaPrecinct.objects.create(short_name='2400', long_name='SEA 46-2400')
+        cls.other_precinct = WaPrecinct.objects.create(short_name='2401', long_name='SEA 46-2401')
+
+    def coordinator(self, full_name, precinct=None, **kwargs):
+        return PrecinctCoordinator.objects.create(area=self.area, precinct=precinct or self.precinct, full_name=full_name, **kwargs)
+
+    def test_nickname_shares_a_name_block(self):
+        bob = self.coordinator('Bob Smith', phone_number='206-555-0100')
+        robert = self.coordinator('Robert Smith', phone_number='(206) 555-0100')
+        finder = DuplicateFinder().load()
+
+        name_blocks = [pks for key, pks in finder.blocks.items() if key[0] == 'name']
+        self.assertEqual([sorted(pks) for pks in name_blocks], [[bob.pk, robert.pk]])
+        self.assertEqual(finder.clusters(), [[bob.pk, robert.pk]])
+
+    def test_scores(self):
+        a = self.coordinator('Bob Smith', email='bob@example.com', phone_number='206-555-0100')
+        b = self.coordinator('Robert Smith', email='BOB@example.com ', phone_number='2065550100')
+        c = self.coordinator('Alice Smith', precinct=self.other_precinct, phone_number='206-555-0100')
+        finder = DuplicateFinder().load()
+
+        # email, phone, last name, (canonical) first name, precinct
+        self.assertAlmostEqual(finder.score(a.pk, b.pk), 0.5 + 0.4 + 0.25 + 0.2 + 0.15)
+        # phone and last name, less a different first name
+        self.assertAlmostEqual(finder.score(a.pk, c.pk), 0.4 + 0.25 - 0.5)
+        self.assertEqual(finder.clusters(), [[a.pk, b.pk]])
+
+    def test_same_name_without_shared_contact_is_not_a_duplicate(self):
+        self.coordinator('Pat Lee', email='pat.lee@example.com')
+        self.coordinator('Pat Lee', email='patricia@example.com', phone_number='206-555-0199')
+        self.assertEqual(DuplicateFinder().clusters(), [])
+
+    def test_oversized_blocks_are_skipped(self):
+        for i in range(3):
+            self.coordinator('Volunteer %s' % i, phone_number='206-555-0100', precinct=self.other_precinct)
+        finder = DuplicateFinder(max_block_size=2)
+        self.assertEqual(finder.clusters(), [])
+        self.assertEqual(finder.skipped_blocks, 1)
+
+    def test_merge_clusters(self):
+        self.coordinator('Bob Smith', email='bob@example.com', phone_number='206-555-0100', notes='Met at caucus')
+        walker = self.coordinator('Robert Smith', email='bob@example.com', phone_number='425-555-0199')
+        walker.status = 'will-walk'
+        walker.save()
+
+        self.assertEqual(merge_clusters(DuplicateFinder().clusters()), 1)
+
+        survivor = PrecinctCoordinator.objects.get()
+        self.assertEqual(survivor.pk, walker.pk)
+        self.assertEqual(survivor.notes, 'Met at caucus')
+        self.assertEqual(sorted(survivor.phone_numbers.values_list('number', flat=True)), ['+12065550100', '+14255550199'])
+        self.assertFalse(StatusChange.objects.exclude(coordinator=survivor).exists())
+        counts = dict(((row.area_id, row.status), row.count) for row in AreaStatusCount.objects.all())
+        self.assertEqual(counts.get((self.area.pk, None)), 0)
+        self.assertEqual(counts.get((self.area.pk, 'will-walk')), 1)
+
+    def test_admin_action_confirms_before_merging(self):
+        self.client.force_login(self.user)
+        a = self.coordinator('Bob Smith', email='bob@example.com')
+        b = self.coordinator('Robert Smith', email='bob@example.com')
+        url = reverse('admin:areas_precinctcoordinator_changelist')
+        data = {'action': 'merge_duplicates', helpers.ACTION_CHECKBOX_NAME: [a.pk, b.pk]}
+
+        response = self.client.post(url, data)
+        self.assertContains(response, 'Yes, merge 1 group')
+        self.assertEqual(PrecinctCoordinator.objects.count(), 2)
+
+        response = self.client.post(url, dict(data, post='yes', cluster='%s,%s' % (a.pk, b.pk)))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(PrecinctCoordinator.objects.count(), 1)
+
+
+class AreaMembershipTests(TestCase):
+
+    def test_rebuild_from_area_maps(self):
+        ingraham = Area.objects.create(name='Ingraham', slug='ingraham')
+        elsewhere = Area.objects.create(name='Elsewhere', slug='elsewhere', color='#065143')
+        listed = WaPrecinct.objects.create(short_name='1311', long_name='SEA 46-1311')
+        moved = WaPrecinct.objects.create(short_name='1400', long_name='SEA 46-1400')
+        unlisted = WaPrecinct.objects.create(short_name='9999', long_name='SEA 46-9999')
+        AreaPrecinct.objects.create(area=elsewhere, precinct=moved)
+        AreaPrecinct.objects.create(area=elsewhere, precinct=unlisted)
+
+        self.assertEqual(AreaPrecinct.rebuild(), 3)
+        self.assertEqual(AreaPrecinct.lookup_table(), {listed.pk: ingraham.pk, moved.pk: ingraham.pk})
+        self.assertEqual(AreaPrecinct.rebuild(), 0)
+
+
+def legacy_mailto(obj, author_name):
+    """
+    PrecinctCoordinatorAdmin.linkable_email as it was before areas.mailmerge, frozen.
+    """
+    if not obj.email:
+        return ''
+    extra = {}
+    first_name = obj.full_name.split(' ')[0]
+    precinct_name = obj.precinct.long_name
+
+    if len(filter(lambda a: a.slug in ['elected', 'appointed', 'acting', 'elected-post-reorg'], obj.affiliations.all())):
+        descriptor = 'PCOs'
+    elif len(filter(lambda a: a.slug == 'delegate', obj.affiliations.all())):
+        descriptor = 'precinct delegates who caucused with us in March,'
+    else:
+        descriptor = 'volunteers'
+
+    subject_verb = "planning on" if len(filter(lambda a: a.slug == 'elected', obj.affiliations.all())) else 'interested in'
+
+    if not obj.status:
+        extra = {
+            'subject': "[46 Dems] %(first_name)s, are you %(verb)s walking your precinct?" % {'first_name': first_name, 'verb': subject_verb},
+            'body': """Hi %(first_name)s,
+
+My name is %(author_name)s, I'm a volunteer with the 46th District Democrats.
+
+Election Day is just around the corner, and we are excited to be ramping up our Get Out the Vote efforts in the 46th. We are reaching out to %(descriptor)s and wondered if you'd be interested in walking your precinct, %(precinct_name)s? It would be a huge help toward turning out Democratic voters in your neighborhood, and with your help, we will win big on Election Day.
+
+We have got a packet with a walk list and literature all ready to go. We can also set you up with a mobile phone app called MiniVAN, which makes walking your precinct a breeze.
+
+Let me know if you're interested, and we'll get you all setup. We'd love to have your help in making this election a big success for Democrats.
+
+Thanks, %(first_name)s!
+
+%(author_name)s""" % {'first_name': first_name, 'author_name': author_name, 'precinct_name': precinct_name, 'descriptor': descriptor}
+        }
+
+    elif obj.status == 'will-walk':
+        extra = {
+            'subject': "%(first_name)s, your walk packet for %(precinct_name)s is ready for pickup" % {'first_name': first_name, 'precinct_name': precinct_name},
+            'body': """Hi %(first_name)s,
+
+Just a friendly heads up -- your precinct walk packet is available for pickup.
+
+
+
+Please make a plan to scoop it up and walk your precinct (and let me know if you have any questions!)
+
+Thanks!
+
+%(author_name)s""" % {'first_name': first_name, 'author_name': author_name}
+        }
+
+    elif obj.status == 'picked-up-packet':
+        extra = {
+            'subject': "How's it going?",
+            'body': """Hey %(first_name)s,
+
+Just checking in -- have you been able to walk your precinct?
+
+Thanks!
+
+%(author_name)s""" % {'first_name': first_name, 'author_name': author_name}
+        }
+
+    for k, v in extra.iteritems():
+        extra[k] = "%0D%0A".join(v.split('\n'))
+
+    return "<a href=\"mailto:%(email)s%(extra)s\" target=\"_blank\">%(email)s</a>" % {'email': obj.email, 'extra': '?' +  "&".join(["=".join([k,v]) for k,v in extra.iteritems()]) if extra else ''}
+
+
+class MailMergeTests(TestCase):
+
+    def test_mailto_matches_the_old_links(self):
+        area = Area.objects.create(name='Wedgewood', slug='wedgewood', color='#065143')
+        precinct = WaPrecinct.objects.create(short_name='2400', long_name='SEA 46-2400')
+        affiliations = dict((slug, Affiliation.objects.create(label=slug.title(), slug=slug))
+                            for slug in ['elected', 'appointed', 'acting', 'elected-post-reorg', 'delegate', 'volunteer'])
+        mail_merge = MailMerge('Pat')
+
+        statuses = [status for status, label in STATUSES] + ['']
+        for slugs in [[], ['elected'], ['appointed'], ['acting', 'delegate'], ['elected-post-reorg'], ['delegate'], ['volunteer']]:
+            for status in statuses:
+                coordinator = PrecinctCoordinator.objects.create(area=area, precinct=precinct, full_name='Bob Smith',
+                                                                 email='bob@example.com', status=status)
+                coordinator.affiliations.add(*[affiliations[slug] for slug in slugs])
+                coordinator = PrecinctCoordinator.objects.get(pk=coordinator.pk)
+                self.assertEqual(mail_merge.mailto(coordinator), legacy_mailto(coordinator, 'Pat'), (slugs, status))
+
+
+class ResolvePrecinctsViewTests(TestCase):
+
+    def post(self, points):
+        return self.client.post(reverse('resolve-precincts'), json.dumps({'points': points}), content_type='application/json')
+
+    def test_requires_staff_with_permission(self):
+        self.assertEqual(self.post([]).status_code, 403)
+        self.client.force_login(User.objects.create_user('walker', 'walker@example.com', 'password', is_staff=True))
+        self.assertEqual(self.post([]).status_code, 403)
+
+    def test_posts_without_a_csrf_token(self):
+        self.client = self.client_class(enforce_csrf_checks=True)
+        self.client.force_login(User.objects.create_superuser('organizer', 'organizer@example.com', 'password'))
+        WaPrecinct.objects.create(short_name='2400', long_name='SEA 46-2400',
+                                  map_cache_geometry=MultiPolygon(Polygon.from_bbox((-122.3, 47.6, -122.29, 47.61)), srid=4326))
+
+        response = self.post([[47.605, -122.295], [0, 0]])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p and p['long_name'] for p in json.loads(response.content)['precincts']], ['SEA 46-2400', None])
+
+
+class PhoneNumberParsingTests(SimpleTestCase):
+
+    def test_separators(self):
+        for text in ['206-555-0100, 425-555-0199', '206-555-0100\n425-555-0199', '206-555-0100; 425-555-0199',
+                     '206-555-0100 / 425-555-0199', '206-555-0100/425-555-0199', '206-555-0100 or 425-555-0199',
+                     '206-555-0100 OR 425-555-0199']:
+            self.assertEqual([number for number, label in parse_phone_numbers(text)], ['+12065550100', '+14255550199'], text)
+
+    def test_slash_inside_a_number(self):
+        self.assertEqual(parse_phone_numbers('206/555-0100'), [('+12065550100', '')])
+
+    def test_labels_and_extensions(self):
+        self.assertEqual(parse_phone_numbers('(206) 555-0100 (cell)\nw: 425.555.0199 ext. 12'),
+                         [('+12065550100', 'cell'), ('+14255550199', 'work')])
+
+    def test_duplicates_and_country_codes(self):
+        self.assertEqual(parse_phone_numbers('1-206-555-0100, 206 555 0100, +44 20 7946 0958'),
+                         [('+12065550100', ''), ('+442079460958', '')])
+
+    def test_unparsed_text(self):
+        self.assertEqual(parse_phone_numbers('555-0101 (Jim)'), [])
+        self.assertEqual(unparsed_phone_text('206-555-0100 or 555-0101 (Jim)'), ['555-0101 (Jim)'])
+
+
+class PhoneNumberLookupTests(TestCase):
+
+    def test_with_phone_number(self):
+        area = Area.objects.create(name='Wedgewood', slug='wedgewood', color='#065143')
+        precinct = WaPrecinct.objects.create(short_name='2400', long_name='SEA 46-2400')
+        coordinator = PrecinctCoordinator.objects.create(area=area, precinct=precinct, full_name='Bob Smith',
+                                                         phone_number='206-555-0100 / 425-555-0199')
+        PrecinctCoordinator.objects.create(area=area, precinct=precinct, full_name='Jim', phone_number='555-0101 (Jim)')
+
+        self.assertEqual(list(PrecinctCoordinator.objects.with_phone_number('(425) 555-0199')), [coordinator])
+        self.assertFalse(PrecinctCoordinator.objects.with_phone_number('555-0101').exists())
+        self.assertFalse(PrecinctCoordinator.objects.with_phone_number('').exists())
+
+
+def decode_topology(topology):
+    """
+    {id: [[ring, ...], ...]} back out of a Topology, as topojson.feature() would.
+    """
+    (kx, ky), (dx, dy) = topology['transform']['scale'], topology['transform']['translate']
+    arcs = []
+    for encoded in topology['arcs']:
+        x = y = 0
+        arc = []
+        for ex, ey in encoded:
+            x, y = x + ex, y + ey
+            arc.append((x * kx + dx, y * ky + dy))
+        arcs.append(arc)
+
+    def ring(arc_ids):
+        points = []
+        for arc_id in arc_ids:
+            arc = arcs[arc_id] if arc_id >= 0 else list(reversed(arcs[~arc_id]))
+            points.extend(arc[1:] if points else arc)
+        return points
+
+    return dict((geometry['id'], [[ring(arc_ids) for arc_ids in polygon] for polygon in geometry['arcs']])
+                for geometry in topology['objects']['precincts']['geometries'])
+
+
+def normalized_ring(ring):
+    # open, starting from its smallest point; orientation is kept
+    ring = [tuple(point) for point in ring]
+    if ring[0] == ring[-1]:
+        ring = ring[:-1]
+    start = ring.index(min(ring))
+    return ring[start:] + ring[:start]
+
+
+class TopoJSONTests(SimpleTestCase):
+    # coordinates 0-10 on an 11-point grid quantize exactly
+
+    def polygon(self, *rings):
+        return {'type': 'Polygon', 'coordinates': [list(ring) + [ring[0]] for ring in rings]}
+
+    def assertRoundTrips(self, features, topology):
+        decoded = decode_topology(topology)
+        for feature_id, properties, geometry in features:
+            expected = [[normalized_ring(ring) for ring in polygon] for polygon in topojson._polygons(geometry)]
+            self.assertEqual([[normalized_ring(ring) for ring in polygon] for polygon in decoded[feature_id]], expected)
+
+    def test_shared_border(self):
+        features = [
+            (1, {}, self.polygon([(0, 0), (5, 0), (5, 10), (0, 10)])),
+            (2, {}, self.polygon([(5, 0), (10, 0), (10, 10), (5, 10)])),
+        ]
+        topology = topojson.encode(features, quantization=11)
+        self.assertRoundTrips(features, topology)
+
+        # the border between them is one arc, walked forwards by one and backwards by the other
+        [left], [right] = [g['arcs'][0] for g in topology['objects']['precincts']['geometries']]
+        shared = set(left) & set(~arc_id for arc_id in right)
+        self.assertEqual(len(shared), 1)
+        self.assertEqual(len(topology['arcs']), 3)
+
+    def test_hole_filled_by_an_island(self):
+        hole = [(3, 3), (3, 7), (7, 7), (7, 3)]
+        features = [
+            (1, {}, self.polygon([(0, 0), (10, 0), (10, 10), (0, 10)], hole)),
+            (2, {}, self.polygon(list(reversed(hole)))),
+        ]
+        topology = topojson.encode(features, quantization=11)
+        self.assertRoundTrips(features, topology)
+
+        [outer, inner], [island] = [g['arcs'][0] for g in topology['objects']['precincts']['geometries']]
+        self.assertEqual(inner, [~arc_id for arc_id in island])
+        self.assertEqual(len(topology['arcs']), 2)
+
+    def test_multipolygon(self):
+        features = [(1, {}, {'type': 'MultiPolygon', 'coordinates': [
+            self.polygon([(0, 0), (2, 0), (2, 2), (0, 2)])['coordinates'],
+            self.polygon([(8, 8), (10, 8), (10, 10), (8, 10)])['coordinates'],
+        ]})]
+        self.assertRoundTrips(features, topojson.encode(features, quantization=11))
+
+    def test_simplified_border_stays_shared(self):
+        # a wiggly border a tolerance of 1 flattens
+        border = [(5, y) for y in range(0, 11)]
+        border[3], border[6] = (5.4, 3), (4.6, 6)
+        features = [
+            (1, {}, self.polygon(*[[(0, 0)] + border + [(0, 10)]])),
+            (2, {}, self.polygon(*[[(10, 10)] + list(reversed(border)) + [(10, 0)]])),
+        ]
+        topology = topojson.encode(features, quantization=101, simplify=1)
+        decoded = decode_topology(topology)
+
+        self.assertEqual(normalized_ring(decoded[1][0][0]), [(0, 0), (5, 0), (5, 10), (0, 10)])
+        self.assertEqual(normalized_ring(decoded[2][0][0]), [(5, 0), (10, 0), (10, 10), (5, 10)])
+        [left], [right] = [g['arcs'][0] for g in topology['objects']['precincts']['geometries']]
+        self.assertEqual(len(set(left) & set(~arc_id for arc_id in right)), 1)
+
+        # under the tolerance, the wiggles survive
+        decoded = decode_topology(topojson.encode(features, quantization=101, simplify=0.1))
+        self.assertIn((5.4, 3), [(round(x, 6), round(y, 6)) for x, y in decoded[1][0][0]])
+
+    def test_rejects_other_geometry(self):
+        with self.assertRaises(ValueError):
+            topojson.encode([(1, {}, {'type': 'Point', 'coordinates': [0, 0]})])
+
+
+class TileInvalidationTests(SimpleTestCase):
+
+    def lonlat(self, x, y):
+        return x * 180 / ORIGIN_SHIFT, math.degrees(math.atan(math.sinh(y * math.pi / ORIGIN_SHIFT)))
+
+    def test_tile_containing_a_point(self):
+        xmin, ymin, xmax, ymax = tile_bounds(12, 655, 1430)
+        lon, lat = self.lonlat((xmin + xmax) / 2, (ymin + ymax) / 2)
+        self.assertEqual(list(tiles_for_extent((lon, lat, lon, lat), 12, buffer=0)), [(655, 1430)])
+
+    def test_buffer_reaches_neighbouring_tiles(self):
+        # a point just inside a tile's east edge is drawn in the buffer of the tile to its east
+        xmin, ymin, xmax, ymax = tile_bounds(14, 2623, 5720)
+        lon, lat = self.lonlat(xmax - (xmax - xmin) * TILE_BUFFER / TILE_EXTENT / 2, (ymin + ymax) / 2)
+        self.assertEqual(set(tiles_for_extent((lon, lat, lon, lat), 14)), {(2623, 5720), (2624, 5720)})
+        self.assertEqual(set(tiles_for_extent((lon, lat, lon, lat), 14, buffer=0)), {(2623, 5720)})
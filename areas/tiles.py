@@ -0,0 +1,146 @@
+import errno
+import math
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import connection
+
+
+# spherical mercator (EPSG:3857) covers +/- this many meters in both directions
+ORIGIN_SHIFT = 2 * math.pi * 6378137 / 2.0
+
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+MIN_ZOOM = 0
+MAX_ZOOM = 16
+
+TILE_SQL = """
+WITH bounds AS (
+    SELECT ST_MakeEnvelope(%(xmin)s, %(ymin)s, %(xmax)s, %(ymax)s, 3857) AS geom
+)
+SELECT ST_AsMVT(tile, 'precincts', %(extent)s, 'geom') FROM (
+    SELECT p.id, p.long_name AS name, s.best_status AS status, a.color,
+           ST_AsMVTGeom(ST_SimplifyPreserveTopology(ST_Transform(p.map_cache_geometry, 3857), %(tolerance)s),
+                        bounds.geom, %(extent)s, %(buffer)s, true) AS geom
+    FROM wa_precincts p
+    JOIN bounds ON p.map_cache_geometry && ST_Transform(bounds.geom, 4326)
+    LEFT JOIN areas_precinctstatus s ON s.precinct_id = p.id
+    LEFT JOIN areas_areaprecinct m ON m.precinct_id = p.id
+    LEFT JOIN areas_area a ON a.id = m.area_id
+) tile
+WHERE tile.geom IS NOT NULL
+"""
+
+
+def tile_bounds(z, x, y):
+    """
+    Spherical mercator bounds (xmin, ymin, xmax, ymax) of tile z/x/y.
+    """
+    size = 2 * ORIGIN_SHIFT / (2 ** z)
+    xmin = -ORIGIN_SHIFT + x * size
+    ymax = ORIGIN_SHIFT - y * size
+    return xmin, ymax - size, xmin + size, ymax
+
+
+def tiles_for_extent(extent, zoom, buffer=TILE_BUFFER):
+    """
+    Yields the (x, y) of every tile at zoom that touches a lon/lat extent, or
+    comes within buffer (in tile units out of TILE_EXTENT) of it. render_tile
+    clips geometry to the tile plus TILE_BUFFER, so a precinct just outside a
+    tile's edge is still drawn in it.
+    """
+    lon_min, lat_min, lon_max, lat_max = extent
+    n = 2 ** zoom
+    size = 2 * ORIGIN_SHIFT / n
+    margin = size * buffer / float(TILE_EXTENT)
+    west, north = lonlat_to_meters(lon_min, lat_max)
+    east, south = lonlat_to_meters(lon_max, lat_min)
+
+    def tile_index(offset):
+        # offset in meters from the left (or top) edge of the world
+        return min(max(int(math.floor(offset / size)), 0), n - 1)
+
+    for x in range(tile_index(ORIGIN_SHIFT + west - margin), tile_index(ORIGIN_SHIFT + east + margin) + 1):
+        for y in range(tile_index(ORIGIN_SHIFT - north - margin), tile_index(ORIGIN_SHIFT - south + margin) + 1):
+            yield x, y
+
+
+def lonlat_to_meters(lon, lat):
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = lon * ORIGIN_SHIFT / 180.0
+    y = math.log(math.tan(math.radians(90 + lat) / 2.0)) * ORIGIN_SHIFT / math.pi
+    return x, y
+
+
+def tile_path(z, x, y):
+    return os.path.join(settings.TILE_CACHE_DIR, str(z), str(x), '%s.mvt' % y)
+
+
+def render_tile(z, x, y):
+    xmin, ymin, xmax, ymax = tile_bounds(z, x, y)
+    with connection.cursor() as cursor:
+        cursor.execute(TILE_SQL % {
+            'xmin': '%(xmin)s', 'ymin': '%(ymin)s', 'xmax': '%(xmax)s', 'ymax': '%(ymax)s',
+            'extent': TILE_EXTENT,
+            'buffer': TILE_BUFFER,
+            # drop detail smaller than an eighth of a screen pixel at this zoom
+            'tolerance': (xmax - xmin) / 256 / 8,
+        }, {'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax})
+        row = cursor.fetchone()
+    return bytes(row[0]) if row and row[0] else b''
+
+
+def get_tile(z, x, y):
+    """
+    Returns the encoded tile z/x/y, from the on-disk cache when we have it.
+    """
+    path = tile_path(z, x, y)
+    try:
+        with open(path, 'rb') as tile:
+            return tile.read()
+    except IOError:
+        pass
+
+    data = render_tile(z, x, y)
+
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+    # write then rename, so a concurrent request never reads half a tile.
+    handle, temp_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(handle, 'wb') as tile:
+        tile.write(data)
+    os.rename(temp_path, path)
+    return data
+
+
+def invalidate_precinct_tiles(precinct_ids):
+    """
+    Removes every cached tile, at every zoom, that draws any of the given precincts.
+    """
+    from .models import WaPrecinct
+    from django.contrib.gis.db.models import Extent
+
+    precinct_ids = [pk for pk in set(precinct_ids) if pk]
+    if not precinct_ids or not os.path.isdir(settings.TILE_CACHE_DIR):
+        return
+
+    extents = WaPrecinct.objects.filter(pk__in=precinct_ids).exclude(map_cache_geometry=None) \
+                                .values('id').annotate(extent=Extent('map_cache_geometry'))
+    for row in extents:
+        for zoom in range(MIN_ZOOM, MAX_ZOOM + 1):
+            for x, y in tiles_for_extent(row['extent'], zoom):
+                try:
+                    os.remove(tile_path(zoom, x, y))
+                except OSError:
+                    pass
+
+
+def clear_tile_cache():
+    shutil.rmtree(settings.TILE_CACHE_DIR, ignore_errors=True)
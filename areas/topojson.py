@@ -0,0 +1,160 @@
+"""
+A small TopoJSON encoder for precinct maps: neighbouring precincts share their
+borders as arcs, coordinates are quantized to an integer grid and delta-encoded.
+Decode it in the browser with topojson-client's topojson.feature().
+"""
+
+
+DEFAULT_QUANTIZATION = 100000
+
+
+def encode(features, object_name='precincts', quantization=DEFAULT_QUANTIZATION, simplify=None):
+    """
+    Builds a Topology from features, an iterable of (id, properties, geometry)
+    where geometry is a GeoJSON-style Polygon or MultiPolygon dict. simplify is
+    a Douglas-Peucker tolerance in coordinate units, applied to each shared arc
+    once so neighbouring precincts stay seamless.
+    """
+    features = [(feature_id, properties, _polygons(geometry)) for feature_id, properties, geometry in features]
+
+    points = [point for f in features for polygon in f[2] for ring in polygon for point in ring]
+    if not points:
+        return {'type': 'Topology', 'objects': {object_name: {'type': 'GeometryCollection', 'geometries': []}}, 'arcs': []}
+
+    x0, y0 = min(p[0] for p in points), min(p[1] for p in points)
+    x1, y1 = max(p[0] for p in points), max(p[1] for p in points)
+    kx = float(x1 - x0) / (quantization - 1) if x1 > x0 else 1.0
+    ky = float(y1 - y0) / (quantization - 1) if y1 > y0 else 1.0
+
+    def quantize(ring):
+        quantized = []
+        for x, y in ring:
+            point = (int(round((x - x0) / kx)), int(round((y - y0) / ky)))
+            if not quantized or quantized[-1] != point:
+                quantized.append(point)
+        if quantized and quantized[0] == quantized[-1]:
+            quantized.pop()
+        return quantized
+
+    # rings as open lists of grid points; anything under three points has collapsed
+    quantized = []
+    for feature_id, properties, polygons in features:
+        rings = [[quantize(ring) for ring in polygon] for polygon in polygons]
+        quantized.append((feature_id, properties, [[ring for ring in polygon if len(ring) >= 3] for polygon in rings]))
+
+    junctions = _junctions(ring for f in quantized for polygon in f[2] for ring in polygon)
+
+    arcs, arc_ids = [], {}
+
+    def arc_id(arc):
+        key = tuple(arc)
+        if key in arc_ids:
+            return arc_ids[key]
+        reverse = tuple(reversed(arc))
+        if reverse in arc_ids:
+            return ~arc_ids[reverse]
+        arc_ids[key] = len(arcs)
+        arcs.append(arc)
+        return arc_ids[key]
+
+    geometries = []
+    for feature_id, properties, polygons in quantized:
+        polygon_arcs = [[[arc_id(arc) for arc in _cut(ring, junctions)] for ring in polygon] for polygon in polygons if polygon]
+        geometry = {'type': 'MultiPolygon', 'arcs': polygon_arcs, 'properties': properties}
+        if feature_id is not None:
+            geometry['id'] = feature_id
+        geometries.append(geometry)
+
+    if simplify:
+        tolerance = simplify / max(kx, ky)
+        arcs = [_simplify(arc, tolerance) for arc in arcs]
+
+    return {
+        'type': 'Topology',
+        'bbox': [x0, y0, x1, y1],
+        'transform': {'scale': [kx, ky], 'translate': [x0, y0]},
+        'objects': {object_name: {'type': 'GeometryCollection', 'geometries': geometries}},
+        'arcs': [_delta(arc) for arc in arcs],
+    }
+
+
+def _polygons(geometry):
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    elif geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    raise ValueError('Can only encode polygons, not %s' % geometry['type'])
+
+
+def _junctions(rings):
+    """
+    Points where rings meet with different neighbours -- where a shared border starts or ends.
+    """
+    neighbours = {}
+    junctions = set()
+    for ring in rings:
+        count = len(ring)
+        for i, point in enumerate(ring):
+            pair = (ring[i - 1], ring[(i + 1) % count])
+            seen = neighbours.setdefault(point, pair)
+            if seen != pair and seen != (pair[1], pair[0]):
+                junctions.add(point)
+    return junctions
+
+
+def _cut(ring, junctions):
+    """
+    Splits an open ring into closed-ring arcs at each junction. A ring with no
+    junctions becomes one arc, rotated to start at its smallest point so a ring
+    shared whole (a hole and the island filling it) dedupes.
+    """
+    count = len(ring)
+    cuts = [i for i, point in enumerate(ring) if point in junctions]
+    if not cuts:
+        start = ring.index(min(ring))
+        rotated = ring[start:] + ring[:start]
+        return [rotated + [rotated[0]]]
+
+    start = cuts[0]
+    rotated = ring[start:] + ring[:start]
+    closed = rotated + [rotated[0]]
+    positions = sorted((i - start) % count for i in cuts) + [count]
+    return [closed[a:b + 1] for a, b in zip(positions, positions[1:])]
+
+
+def _simplify(arc, tolerance):
+    if len(arc) <= 4:
+        return arc
+
+    keep = [False] * len(arc)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(arc) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (ax, ay), (bx, by) = arc[first], arc[last]
+        dx, dy = bx - ax, by - ay
+        length = (dx * dx + dy * dy) ** 0.5
+        furthest, distance = None, tolerance
+        for i in range(first + 1, last):
+            px, py = arc[i]
+            if length:
+                d = abs(dy * px - dx * py + bx * ay - by * ax) / length
+            else:
+                d = ((px - ax) ** 2 + (py - ay) ** 2) ** 0.5
+            if d > distance:
+                furthest, distance = i, d
+        if furthest is not None:
+            keep[furthest] = True
+            stack.append((first, furthest))
+            stack.append((furthest, last))
+
+    simplified = [point for point, kept in zip(arc, keep) if kept]
+    # a closed arc (a whole ring) still needs to enclose something
+    return simplified if len(simplified) >= 4 or arc[0] != arc[-1] else arc
+
+
+def _delta(arc):
+    encoded = [list(arc[0])]
+    for (px, py), (x, y) in zip(arc, arc[1:]):
+        encoded.append([x - px, y - py])
+    return encoded
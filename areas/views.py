@@ -1,8 +1,15 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.forms import modelformset_factory
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.shortcuts import render
 from django.views.generic import TemplateView
 from .forms import PrecinctCoordinatorForm
 from .models import PrecinctCoordinator
+from .resolver import PrecinctResolver
+from . import tiles
+import json
 
 
 
@@ -12,4 +19,42 @@ class IndexView(TemplateView):
     def get_context_data(self, *args, **kwargs):
         context = super(IndexView, self).get_context_data(*args, **kwargs)
         context['formset'] = modelformset_factory(PrecinctCoordinator, fields=['full_name'])
-        return context
\ No newline at end of file
+        return context
+
+
+@staff_member_required
+def precinct_tile(request, z, x, y):
+    z, x, y = int(z), int(x), int(y)
+    if not tiles.MIN_ZOOM <= z <= tiles.MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise Http404('No such tile.')
+
+    response = HttpResponse(tiles.get_tile(z, x, y), content_type='application/vnd.mapbox-vector-tile')
+    response['Cache-Control'] = 'private, max-age=60'
+    return response
+
+
+@csrf_exempt
+@require_POST
+def resolve_precincts(request):
+    """
+    Takes {"points": [[latitude, longitude], ...]} and answers with the precinct
+    containing each point, in order (null where no precinct does).
+
+    Scripts post JSON here with a staff session cookie and no CSRF token, so
+    instead of redirecting to the login page, anyone who couldn't place
+    coordinators themselves gets a 403. The view only reads.
+    """
+    user = request.user
+    if not (user.is_active and user.is_staff and user.has_perm('areas.change_precinctcoordinator')):
+        return JsonResponse({'error': 'Staff with permission to change coordinators only.'}, status=403)
+
+    try:
+        points = [(float(latitude), float(longitude)) for latitude, longitude in json.loads(request.body)['points']]
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest('Expected {"points": [[latitude, longitude], ...]}')
+
+    resolver = PrecinctResolver.shared()
+    return JsonResponse({'precincts': [
+        {'id': precinct_id, 'long_name': resolver.names[precinct_id]} if precinct_id else None
+        for precinct_id in resolver.resolve(points)
+    ]})
@@ -0,0 +1,171 @@
+"""
+A compact, offline index of one legislative district's voters, keyed by the
+phonetic form of their last name, for matching NationBuilder rows to precincts
+without a round trip to the voter registration database.
+"""
+from array import array
+import bisect
+import cPickle as pickle
+import re
+
+
+FORMAT_VERSION = 1
+
+VOTER_FIELDS = ['fname', 'lname', 'regstnum', 'regstpredirection', 'regstname', 'regstpostdirection', 'precinctcode']
+
+# common nicknames, mapped to the name a voter is likely registered under
+NICKNAMES = {
+    'ABBY': 'ABIGAIL', 'AL': 'ALBERT', 'ALEX': 'ALEXANDER', 'ANDY': 'ANDREW', 'BARB': 'BARBARA',
+    'BEN': 'BENJAMIN', 'BETH': 'ELIZABETH', 'BETSY': 'ELIZABETH', 'BETTY': 'ELIZABETH', 'BILL': 'WILLIAM',
+    'BILLY': 'WILLIAM', 'BOB': 'ROBERT', 'BOBBY': 'ROBERT', 'CATHY': 'CATHERINE', 'CHRIS': 'CHRISTOPHER',
+    'CHUCK': 'CHARLES', 'CINDY': 'CYNTHIA', 'DAN': 'DANIEL', 'DANNY': 'DANIEL', 'DAVE': 'DAVID',
+    'DEB': 'DEBORAH', 'DEBBIE': 'DEBORAH', 'DICK': 'RICHARD', 'DON': 'DONALD', 'ED': 'EDWARD',
+    'EDDIE': 'EDWARD', 'FRED': 'FREDERICK', 'GREG': 'GREGORY', 'JAKE': 'JACOB', 'JEFF': 'JEFFREY',
+    'JENNY': 'JENNIFER', 'JEN': 'JENNIFER', 'JERRY': 'GERALD', 'JIM': 'JAMES', 'JIMMY': 'JAMES',
+    'JOE': 'JOSEPH', 'JOHNNY': 'JOHN', 'JON': 'JONATHAN', 'KATE': 'KATHERINE', 'KATHY': 'KATHERINE',
+    'KATIE': 'KATHERINE', 'KEN': 'KENNETH', 'KENNY': 'KENNETH', 'LARRY': 'LAWRENCE', 'LIZ': 'ELIZABETH',
+    'MAGGIE': 'MARGARET', 'MATT': 'MATTHEW', 'MEG': 'MARGARET', 'MIKE': 'MICHAEL', 'NATE': 'NATHAN',
+    'NICK': 'NICHOLAS', 'PAM': 'PAMELA', 'PAT': 'PATRICIA', 'PEGGY': 'MARGARET', 'PETE': 'PETER',
+    'RICH': 'RICHARD', 'RICK': 'RICHARD', 'ROB': 'ROBERT', 'RON': 'RONALD', 'SAM': 'SAMUEL',
+    'SANDY': 'SANDRA', 'STEVE': 'STEVEN', 'SUE': 'SUSAN', 'SUSIE': 'SUSAN', 'TED': 'THEODORE',
+    'TOM': 'THOMAS', 'TOMMY': 'THOMAS', 'TONY': 'ANTHONY', 'VICKY': 'VICTORIA', 'WILL': 'WILLIAM',
+}
+
+SOUNDEX_CODES = dict((letter, str(code)) for code, letters in enumerate(['AEIOUYHW', 'BFPV', 'CGJKQSXZ', 'DT', 'L', 'MN', 'R']) for letter in letters)
+
+
+def normalize_name(name):
+    return re.sub(r'[^A-Z]', '', (name or '').upper())
+
+
+def canonical_first_name(name):
+    name = normalize_name(name)
+    return NICKNAMES.get(name, name)
+
+
+def soundex(name):
+    name = normalize_name(name)
+    if not name:
+        return ''
+    code = name[0]
+    last = SOUNDEX_CODES.get(name[0])
+    for letter in name[1:]:
+        digit = SOUNDEX_CODES.get(letter)
+        if digit != '0' and digit != last:
+            code += digit
+        if letter not in 'HW':
+            last = digit
+    return (code + '000')[:4]
+
+
+def normalize_street_number(value):
+    digits = re.match(r'\d+', str(value or '').strip())
+    return int(digits.group(0)) if digits else 0
+
+
+def normalize_street_name(value):
+    return ' '.join((value or '').upper().split())
+
+
+class VoterIndex(object):
+    """
+    Voters sorted by last-name soundex, stored column-wise: string columns hold
+    offsets into one shared string table, numeric columns are plain arrays.
+    """
+    STRING_COLUMNS = ['fname', 'lname', 'regstpredirection', 'regstname', 'regstpostdirection']
+
+    def __init__(self, strings, columns, keys, starts):
+        self.strings = strings
+        self.columns = columns
+        self.keys = keys
+        self.starts = starts
+
+    @classmethod
+    def build(cls, voters):
+        rows = sorted(voters, key=lambda voter: soundex(voter['lname']))
+        strings, string_ids = [], {}
+
+        def intern(value):
+            value = normalize_street_name(value)
+            if value not in string_ids:
+                string_ids[value] = len(strings)
+                strings.append(value)
+            return string_ids[value]
+
+        columns = dict((column, array('i')) for column in cls.STRING_COLUMNS + ['regstnum', 'precinctcode'])
+        keys, starts = [], array('i')
+        for i, voter in enumerate(rows):
+            key = soundex(voter['lname'])
+            if not keys or keys[-1] != key:
+                keys.append(key)
+                starts.append(i)
+            for column in cls.STRING_COLUMNS:
+                columns[column].append(intern(voter[column]))
+            columns['regstnum'].append(normalize_street_number(voter['regstnum']))
+            columns['precinctcode'].append(int(voter['precinctcode'] or 0))
+        starts.append(len(rows))
+        return cls(strings, columns, keys, starts)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'rb') as file:
+            data = pickle.load(file)
+        if data.get('version') != FORMAT_VERSION:
+            raise ValueError('%s is not a version %s voter index; rebuild it with build_voter_index.' % (filename, FORMAT_VERSION))
+        return cls(data['strings'], data['columns'], data['keys'], data['starts'])
+
+    def save(self, filename):
+        with open(filename, 'wb') as file:
+            pickle.dump({'version': FORMAT_VERSION, 'strings': self.strings, 'columns': self.columns, 'keys': self.keys, 'starts': self.starts}, file, pickle.HIGHEST_PROTOCOL)
+
+    def __len__(self):
+        return self.starts[-1] if self.starts else 0
+
+    def voter(self, row):
+        voter = dict((column, self.strings[self.columns[column][row]]) for column in self.STRING_COLUMNS)
+        voter['regstnum'] = self.columns['regstnum'][row] or ''
+        voter['precinctcode'] = self.columns['precinctcode'][row]
+        return voter
+
+    def candidates(self, first_name, last_name, address='', limit=10, min_name_score=0):
+        """
+        Voters whose last name sounds like last_name, best first: returns [(score, voter), ...].
+        Voters whose names alone (before any address points) score below
+        min_name_score are left out.
+        """
+        key = soundex(last_name)
+        position = bisect.bisect_left(self.keys, key)
+        if position == len(self.keys) or self.keys[position] != key:
+            return []
+
+        last_name = normalize_name(last_name)
+        first_name = canonical_first_name(first_name)
+        first_key = soundex(first_name)
+        address = ' %s ' % normalize_street_name(address)
+        fnames, lnames, numbers, streets = self.columns['fname'], self.columns['lname'], self.columns['regstnum'], self.columns['regstname']
+
+        scored = []
+        for row in xrange(self.starts[position], self.starts[position + 1]):
+            voter_first = canonical_first_name(self.strings[fnames[row]])
+            if voter_first == first_name:
+                score = 3
+            elif soundex(voter_first) == first_key:
+                score = 2
+            elif voter_first[:1] == first_name[:1]:
+                score = 1
+            else:
+                continue
+
+            if normalize_name(self.strings[lnames[row]]) == last_name:
+                score += 3
+            if score < min_name_score:
+                continue
+            if numbers[row] and (' %s ' % numbers[row]) in address:
+                score += 2
+            street = self.strings[streets[row]]
+            if street and street in address:
+                score += 2
+            scored.append((score, row))
+
+        scored.sort(key=lambda candidate: -candidate[0])
+        return [(score, self.voter(row)) for score, row in scored[:limit]]
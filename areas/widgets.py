@@ -8,13 +8,26 @@ from django.utils.text import Truncator
 class ForeignKeyRawIdHiddenWidget(widgets.ForeignKeyRawIdWidget):
     input_type = 'hidden'
 
+    # {pk: object} filled in for the whole formset at once (see PrecinctCoordinatorInlineFormSet),
+    # so each row's label doesn't cost a query
+    related_objects = None
+
     def label_for_value(self, value):
+        if self.related_objects is not None:
+            try:
+                obj = self.related_objects.get(int(value))
+            except (TypeError, ValueError):
+                obj = None
+            return self.label_for_object(obj) if obj is not None else ''
+
         key = self.rel.get_related_field().name
         try:
             obj = self.rel.model._default_manager.using(self.db).get(**{key: value})
         except (ValueError, self.rel.model.DoesNotExist):
             return ''
+        return self.label_for_object(obj)
 
+    def label_for_object(self, obj):
         label = '&nbsp;<strong>{}</strong>'
         text = Truncator(obj).words(14, truncate='...')
         # try:
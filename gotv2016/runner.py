@@ -0,0 +1,29 @@
+"""
+The test runner: migrations skip unmanaged models, so the tables we only read
+(wa_precincts, which the precinct shapefile load creates in production) are
+created in the test database before the migrations that point at them.
+"""
+from django.apps import apps
+from django.db import connections
+from django.db.models.signals import pre_migrate
+from django.test.runner import DiscoverRunner
+
+
+def create_unmanaged_tables(sender, using, **kwargs):
+    connection = connections[using]
+    existing = set(connection.introspection.table_names())
+    with connection.schema_editor() as editor:
+        for model in apps.get_models():
+            if not model._meta.managed and not model._meta.proxy and model._meta.db_table not in existing:
+                editor.create_model(model)
+                existing.add(model._meta.db_table)
+
+
+class UnmanagedTablesTestRunner(DiscoverRunner):
+
+    def setup_databases(self, **kwargs):
+        pre_migrate.connect(create_unmanaged_tables, dispatch_uid='gotv2016.runner.create_unmanaged_tables')
+        try:
+            return super(UnmanagedTablesTestRunner, self).setup_databases(**kwargs)
+        finally:
+            pre_migrate.disconnect(dispatch_uid='gotv2016.runner.create_unmanaged_tables')
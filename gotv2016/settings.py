@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.gis',
+    'django.contrib.postgres',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
@@ -87,6 +88,9 @@ DATABASES = {
     'default': dj_database_url.config()
 }
 
+# creates wa_precincts (unmanaged) in the test database
+TEST_RUNNER = 'gotv2016.runner.UnmanagedTablesTestRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.10/ref/settings/#auth-password-validators
@@ -127,4 +131,10 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = '.static'
 
+# 'geojson' or 'topojson': how the admin maps ship precinct shapes to the browser
+MAP_PAYLOAD_FORMAT = os.environ.get('MAP_PAYLOAD_FORMAT', 'geojson')
+
+# Rendered vector tiles (see areas.tiles)
+TILE_CACHE_DIR = os.environ.get('TILE_CACHE_DIR', os.path.join(BASE_DIR, '.tiles'))
+
 INTERNAL_IPS = ['127.0.0.1']
\ No newline at end of file
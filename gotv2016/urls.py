@@ -29,6 +29,8 @@ if settings.DEBUG:
 
 urlpatterns += [
     url(r'^admin/', admin.site.urls),
+    url(r'^precincts/resolve/$', views.resolve_precincts, name='resolve-precincts'),
+    url(r'^tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.mvt$', views.precinct_tile, name='precinct-tile'),
     # url(r'^$', views.IndexView.as_view(), name='index')
 ]
 